@@ -0,0 +1,41 @@
+import pytest
+from contextlib import contextmanager
+from rest_framework.test import APIClient
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from store.customers import customer_cache
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    }
+    cache.clear()
+
+@pytest.fixture(autouse=True)
+def clear_customer_cache():
+    #ids are reused once a test's transaction rolls back
+    customer_cache.clear()
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+@pytest.fixture
+def force_authentication(api_client):
+    def do_force_authentication(is_staff=True):
+        return api_client.force_authenticate(user=User(is_staff=is_staff))
+    return do_force_authentication
+
+@pytest.fixture
+def query_budget():
+    #fails the block when it runs more than max_queries queries
+    @contextmanager
+    def do_query_budget(max_queries):
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        assert len(queries) <= max_queries, \
+            f'{len(queries)} queries over a budget of {max_queries}:\n' + '\n'.join(query['sql'] for query in queries)
+    return do_query_budget
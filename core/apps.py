@@ -7,4 +7,7 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self) -> None:
-        import core.signals.handler
\ No newline at end of file
+        import core.signals.handler
+        from django.conf import settings
+        from .logs import start_listener
+        start_listener(settings.CORE_LOG_BATCH_SIZE)
\ No newline at end of file
@@ -0,0 +1,134 @@
+from time import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+CLAIMS_AT_CLAIM = 'claims_at'
+
+
+def claims_revoked_key(user_id):
+    return f'core:claims_revoked:{user_id}'
+
+
+def add_claims(token, user):
+    from store.customers import resolve_customer
+    customer = resolve_customer(user.pk)
+    token['is_active'] = user.is_active
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token['customer_id'] = customer.id if customer else None
+    token['customer_membership'] = customer.membership if customer else None
+    # superusers pass every check, no need to list their permissions
+    token['perms'] = [] if user.is_superuser else sorted(user.get_all_permissions())
+    token[CLAIMS_AT_CLAIM] = time()
+    return token
+
+
+def revoke_claims(user_ids):
+    """
+    Stops trusting the claims issued to these users so far, their next
+    requests load the user row until they get a new access token. Claims
+    older than CORE_TOKEN_CLAIMS_MAX_AGE are never trusted, so the marker
+    doesn't need to outlive that.
+    """
+    user_ids = list(user_ids)
+    def mark():
+        now = time()
+        cache.set_many({claims_revoked_key(user_id): now for user_id in user_ids},
+                       timeout = settings.CORE_TOKEN_CLAIMS_MAX_AGE)
+    # again on commit, a token issued while the change was uncommitted read the old row
+    mark()
+    transaction.on_commit(mark)
+
+
+def claims_are_current(token):
+    claims_at = token.get(CLAIMS_AT_CLAIM)
+    if claims_at is None or time() - claims_at > settings.CORE_TOKEN_CLAIMS_MAX_AGE:
+        return False
+    revoked_at = cache.get(claims_revoked_key(token[api_settings.USER_ID_CLAIM]))
+    return revoked_at is None or revoked_at < claims_at
+
+
+class ClaimsUser:
+    """
+    request.user answered from the access token: id, is_active, is_staff,
+    is_superuser, customer_id, customer_membership and the permission checks
+    come from the claims. Anything else loads the user row once and is read
+    from, or written to, that instance.
+    """
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, token, load_user):
+        self.__dict__.update(
+            _load_user = load_user,
+            _user = None,
+            id = get_user_model()._meta.pk.to_python(token[api_settings.USER_ID_CLAIM]),
+            # absent from tokens issued before it was added, those belonged to active users
+            is_active = token.get('is_active', True),
+            is_staff = token['is_staff'],
+            is_superuser = token['is_superuser'],
+            customer_id = token['customer_id'],
+            # absent from tokens issued before it was added
+            customer_membership = token.get('customer_membership'),
+            perms = frozenset(token['perms']),
+        )
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_user(self):
+        if self._user is None:
+            self.__dict__['_user'] = self._load_user()
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.get_user(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get_user(), name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, (ClaimsUser, get_user_model())) and other.pk == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __str__(self):
+        return str(self.get_user())
+
+    def get_all_permissions(self, obj = None):
+        if obj is not None:
+            return self.get_user().get_all_permissions(obj)
+        return set(self.perms)
+
+    def has_perm(self, perm, obj = None):
+        if obj is not None:
+            return self.get_user().has_perm(perm, obj)
+        return self.is_superuser or perm in self.perms
+
+    def has_perms(self, perm_list, obj = None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, app_label):
+        return self.is_superuser or any(perm.startswith(f'{app_label}.') for perm in self.perms)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the user SELECT while the token's claims are
+    current, tokens without claims or with revoked ones take the usual path.
+    """
+    def get_user(self, validated_token):
+        if not claims_are_current(validated_token):
+            return super().get_user(validated_token)
+        user = ClaimsUser(validated_token, lambda: super(ClaimsJWTAuthentication, self).get_user(validated_token))
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code = 'user_inactive')
+        return user
@@ -0,0 +1,67 @@
+from threading import Lock
+from time import perf_counter
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.mysql.base import Database, DatabaseWrapper as MySQLDatabaseWrapper
+from core.db.pool import ConnectionPool
+from core.metrics import DB_CONNECTION_ACQUIRE
+
+
+def connection_is_usable(connection):
+    try:
+        connection.ping()
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(MySQLDatabaseWrapper):
+    """
+    The MySQL backend, timing every connection it opens into
+    db_connection_acquire_seconds. With OPTIONS['pool'] set, e.g.
+    {'max_size': 10, 'timeout': 30}, closed connections go back to a
+    per-process pool for the next request or thread instead of being torn
+    down, and a request waits for one when max_size are already in use.
+    """
+    pools = {}
+    pools_lock = Lock()
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured("Pooling doesn't support persistent connections.")
+        with self.pools_lock:
+            if self.alias not in self.pools:
+                options = options if isinstance(options, dict) else {}
+                self.pools[self.alias] = ConnectionPool(is_usable = connection_is_usable, **options)
+            return self.pools[self.alias]
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        start = perf_counter()
+        pool = self.pool
+        if pool is None:
+            (connection, source) = (super().get_new_connection(conn_params), 'new')
+        else:
+            (connection, source) = pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        DB_CONNECTION_ACQUIRE.labels(self.alias, source).observe(perf_counter() - start)
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        # a connection closed mid transaction or after an error isn't handed to anyone else
+        if pool is None or self.connection is None:
+            return super()._close()
+        if self.in_atomic_block or self.errors_occurred:
+            return pool.discard(self.connection)
+        with self.wrap_database_errors:
+            if not self.get_autocommit():
+                # turning autocommit back on in the next connect() would commit it
+                self.connection.rollback()
+        pool.release(self.connection)
@@ -0,0 +1,88 @@
+import os
+from threading import Condition
+from time import monotonic
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Raw DB connections shared by the threads of a process. At most max_size
+    are open at once, checked out and idle together. acquire() hands out the
+    most recently released idle one, pinging it first when it sat idle for
+    more than check_after seconds, opens a new one while under max_size and
+    otherwise waits up to timeout seconds for one to be released before
+    raising PoolTimeout. Idle connections older than max_idle are closed.
+    """
+    def __init__(self, max_size, check_after = 5, max_idle = 300, timeout = 30, is_usable = None):
+        self.max_size = max_size
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.is_usable = is_usable or (lambda connection: True)
+        self.reset()
+
+    def reset(self):
+        # forgets, without closing, connections a forked process shares with its parent
+        self.pid = os.getpid()
+        self.idle = []
+        self.size = 0
+        self.changed = Condition()
+
+    def acquire(self, connect):
+        """Returns (connection, 'pool' or 'new')."""
+        if self.pid != os.getpid():
+            self.reset()
+        deadline = monotonic() + self.timeout
+        while True:
+            with self.changed:
+                while not self.idle and self.size >= self.max_size:
+                    left = deadline - monotonic()
+                    if left <= 0 or not self.changed.wait(left):
+                        raise PoolTimeout(f'No connection was released in {self.timeout}s, all {self.max_size} are in use')
+                if self.idle:
+                    (connection, released_at) = self.idle.pop()
+                else:
+                    # the slot is taken here, the connection is opened outside the lock
+                    self.size += 1
+                    connection = None
+            if connection is None:
+                try:
+                    return (connect(), 'new')
+                except BaseException:
+                    self.forget()
+                    raise
+            idle_for = monotonic() - released_at
+            if idle_for > self.max_idle or (idle_for > self.check_after and not self.is_usable(connection)):
+                self.discard(connection)
+                continue
+            return (connection, 'pool')
+
+    def release(self, connection):
+        if self.pid != os.getpid():
+            return
+        with self.changed:
+            self.idle.append((connection, monotonic()))
+            self.changed.notify()
+
+    def discard(self, connection):
+        """Closes a connection acquire() handed out, freeing its slot."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        if self.pid == os.getpid():
+            self.forget()
+
+    def forget(self):
+        with self.changed:
+            self.size -= 1
+            self.changed.notify()
+
+    def close(self):
+        with self.changed:
+            (idle, self.idle) = (self.idle, [])
+        for (connection, released_at) in idle:
+            self.discard(connection)
@@ -0,0 +1,158 @@
+import atexit
+import json
+import logging
+import os
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import Empty, SimpleQueue
+
+# the handlers of this logger are driven by the listener thread, nothing else logs to it
+SINK_LOGGER = 'core.logs.sink'
+
+# the id of the request being handled, '-' outside of a request
+current_request_id = ContextVar('current_request_id', default = '-')
+
+log_queue = SimpleQueue()
+listener = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = current_request_id.get()
+        return True
+
+
+class QueuedHandler(QueueHandler):
+    """Puts records on log_queue, the calling thread never waits on I/O or a handler lock."""
+    def __init__(self, queue = None):
+        super().__init__(log_queue if queue is None else queue)
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that writes and flushes a whole batch of records at once."""
+    def emit_batch(self, records):
+        records = [record for record in records if self.filter(record)]
+        if not records:
+            return
+        self.acquire()
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.tell()
+            pending = []
+            for record in records:
+                line = self.format(record) + self.terminator
+                # rolls over between the records that would cross maxBytes, like one emit per record would
+                if self.maxBytes > 0 and size > 0 and size + len(line) >= self.maxBytes:
+                    self.stream.write(''.join(pending))
+                    self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    (size, pending) = (0, [])
+                pending.append(line)
+                size += len(line)
+            self.stream.write(''.join(pending))
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
+        finally:
+            self.release()
+
+
+class BatchingQueueListener(QueueListener):
+    """
+    QueueListener that takes up to batch_size queued records at a time, handlers
+    with an emit_batch get the batch in one call, the others record by record.
+    """
+    def __init__(self, queue, *handlers, batch_size = 100, respect_handler_level = True):
+        super().__init__(queue, *handlers, respect_handler_level = respect_handler_level)
+        self.batch_size = batch_size
+
+    def _monitor(self):
+        while True:
+            record = self.dequeue(True)
+            if record is self._sentinel:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.dequeue(False)
+                except Empty:
+                    break
+                if record is self._sentinel:
+                    stop = True
+                    break
+                batch.append(record)
+            self.handle_batch(batch)
+            if stop:
+                return
+
+    def handle_batch(self, batch):
+        batch = [self.prepare(record) for record in batch]
+        for handler in self.handlers:
+            records = batch
+            if self.respect_handler_level:
+                records = [record for record in batch if record.levelno >= handler.level]
+            if hasattr(handler, 'emit_batch'):
+                handler.emit_batch(records)
+            else:
+                for record in records:
+                    handler.handle(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the request id set by RequestIdFilter."""
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+        }
+        if record.exc_info:
+            # queued records carry the traceback in their message already
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default = str)
+
+
+def start_listener(batch_size):
+    """
+    Hands the queued records to the SINK_LOGGER handlers from a background
+    thread. Records logged before it starts wait on the queue.
+    """
+    global listener
+    if listener is not None:
+        return listener
+    handlers = logging.getLogger(SINK_LOGGER).handlers
+    listener = BatchingQueueListener(log_queue, *handlers, batch_size = batch_size)
+    listener.start()
+    atexit.register(stop_listener)
+    return listener
+
+
+def stop_listener():
+    # drains what's already queued before returning
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+def restart_listener_in_child():
+    # a forked worker doesn't inherit the listener thread, and the parent's
+    # queue may have been locked mid-operation, so it gets its own of both
+    global log_queue
+    if listener is None:
+        return
+    log_queue = SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, QueuedHandler):
+            handler.queue = log_queue
+    listener.queue = log_queue
+    listener._thread = None
+    listener.start()
+
+
+os.register_at_fork(after_in_child = restart_listener_in_child)
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from time import perf_counter
+from uuid import uuid4
+from core.serializers import TokenObtainPairSerializer
+from store.views import OrderViewSets
+
+AUTHENTICATIONS = {
+    'user row': 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'claims': 'core.authentication.ClaimsJWTAuthentication',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compares authenticated request latency with the user row lookup and with token claims'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create(username=f'benchmark-{uuid4()}', email=f'{uuid4()}@benchmark.local')
+        tokens = {
+            'user row': RefreshToken.for_user(user).access_token,
+            'claims': TokenObtainPairSerializer.get_token(user).access_token,
+        }
+        factory = APIRequestFactory()
+        try:
+            for (name, authentication) in AUTHENTICATIONS.items():
+                # the view class bound its authentication_classes at import, set them per run
+                view = OrderViewSets.as_view({'get': 'list'}, authentication_classes=[import_string(authentication)])
+                request = lambda: view(factory.get('/store/order/', HTTP_AUTHORIZATION=f'JWT {tokens[name]}'))
+                # warm up the customer cache and the per process state
+                request()
+                with CaptureQueriesContext(connection) as queries:
+                    request()
+                start = perf_counter()
+                for _ in range(options['requests']):
+                    request()
+                elapsed = perf_counter() - start
+                print(f'{name:<10} {elapsed / options["requests"] * 1000:7.3f}ms/request  '
+                      f'{len(queries)} queries/request')
+        finally:
+            user.delete()
@@ -0,0 +1,62 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+from queue import SimpleQueue
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from core.logs import BatchedRotatingFileHandler, BatchingQueueListener, QueuedHandler
+
+logger = logging.getLogger('core.benchmark_logging')
+
+
+def view(request, lines):
+    for line in range(lines):
+        logger.info('Handled step %d of %s', line, request.path)
+    return HttpResponse('ok')
+
+
+class Command(BaseCommand):
+    help = 'Compares request throughput with log records written in the request thread and queued to a listener'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--lines', type=int, default=5, help='log records per request')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        formatter = logging.Formatter('{asctime} ({levelname}) - {name} - {message}', style='{')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        with TemporaryDirectory() as directory:
+            for mode in ['direct', 'queued']:
+                if mode == 'direct':
+                    handler = RotatingFileHandler(f'{directory}/direct.log', maxBytes=10 * 1024 * 1024)
+                    listener = None
+                    logger.handlers = [handler]
+                else:
+                    handler = BatchedRotatingFileHandler(f'{directory}/queued.log', maxBytes=10 * 1024 * 1024)
+                    queue = SimpleQueue()
+                    listener = BatchingQueueListener(queue, handler, batch_size=options['batch_size'])
+                    listener.start()
+                    logger.handlers = [QueuedHandler(queue)]
+                handler.setFormatter(formatter)
+                request = lambda _: view(factory.get('/store/products/'), options['lines'])
+                start = perf_counter()
+                with ThreadPoolExecutor(options['threads']) as executor:
+                    list(executor.map(request, range(options['requests'])))
+                elapsed = perf_counter() - start
+                drained = 0.0
+                if listener is not None:
+                    listener.stop()
+                    drained = perf_counter() - start - elapsed
+                handler.close()
+                print(f'{mode:<7} {options["requests"] / elapsed:9.0f} requests/s  '
+                      f'{elapsed / options["requests"] * 1000:7.3f}ms/request  '
+                      f'{drained * 1000:7.1f}ms to drain the queue')
+        logger.handlers = []
+        logger.propagate = True
@@ -0,0 +1,61 @@
+import os
+import shutil
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client import multiprocess, start_http_server
+
+# with PROMETHEUS_MULTIPROC_DIR set, prometheus_client keeps every value in a
+# per-process file in that directory and /metrics adds them up over the workers.
+# Celery workers run in their own container and don't share it, they serve
+# their task metrics themselves on CELERY_METRICS_PORT, see storefront.celery
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ['route', 'method', 'status'])
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request by route',
+    ['route'], buckets = [0, 1, 2, 3, 5, 10, 20, 50, 100])
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result, hit ratio = hit / (hit + miss)',
+    ['cache', 'result'])
+DB_CONNECTION_ACQUIRE = Histogram(
+    'db_connection_acquire_seconds', 'Time to open a DB connection or take one from the pool',
+    ['alias', 'source'], buckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1])
+TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', 'Celery task run time by task and final state',
+    ['task', 'state'], buckets = [0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300])
+
+OUTBOX_EVENTS = Counter(
+    'outbox_events_total', 'Outbox events handled by the relay by topic and result: relayed, failed (offered again) or dead',
+    ['topic', 'result'])
+OUTBOX_BATCH_DURATION = Histogram(
+    'outbox_batch_duration_seconds', 'Time to claim, deliver and settle one batch of outbox events',
+    buckets = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def export():
+    return (generate_latest(get_registry()), CONTENT_TYPE_LATEST)
+
+
+def serve(port):
+    """
+    Serves the metrics of this process and, with PROMETHEUS_MULTIPROC_DIR set,
+    of the processes it forks afterwards on port, returns the (server, thread). Values left in the directory
+    by an earlier run are cleared first, they would be counted again.
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors = True)
+        os.makedirs(directory)
+    return start_http_server(port, registry = get_registry())
@@ -0,0 +1,148 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from random import random
+from uuid import uuid4
+from time import perf_counter
+from django.conf import settings
+from django.db import connection
+from .logs import current_request_id
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES
+from .profiling import Sample, SampleBuffer, current_sample, install_serializer_timer
+
+profiles = SampleBuffer(settings.CORE_PROFILER_BUFFER_SIZE)
+
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles CORE_PROFILER_SAMPLE_RATE of the requests: query count, DB time,
+    serializer time and total latency, kept per resolved view name in this
+    process' ring buffer and served by core.views.ProfilerView. A request
+    that isn't sampled costs one random() call.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.CORE_PROFILER_SAMPLE_RATE
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if self.sample_rate > 0:
+            install_serializer_timer()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random() >= self.sample_rate:
+            return self.get_response(request)
+        sample = Sample(request.method, request.path)
+        token = current_sample.set(sample)
+        start = perf_counter()
+        try:
+            with connection.execute_wrapper(sample.record_query):
+                return self.get_response(request)
+        finally:
+            self.finish(request, sample, start, token)
+
+    async def __acall__(self, request):
+        if random() >= self.sample_rate:
+            return await self.get_response(request)
+        # queries run on the sync threads' own connections here, so only the timings are recorded
+        sample = Sample(request.method, request.path)
+        token = current_sample.set(sample)
+        start = perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request, sample, start, token)
+
+    def finish(self, request, sample, start, token):
+        sample.total_time = perf_counter() - start
+        current_sample.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        sample.view = match.view_name if match else None
+        profiles.add(sample)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Feeds the request latency and query count histograms of core.metrics."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        queries = [0]
+        def count_query(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+        start = perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        self.observe(request, response, start)
+        REQUEST_QUERIES.labels(route_name(request)).observe(queries[0])
+        return response
+
+    async def __acall__(self, request):
+        # queries run on the sync threads' own connections here, only the latency is observed
+        start = perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start):
+        REQUEST_LATENCY.labels(route_name(request), request.method, response.status_code)\
+            .observe(perf_counter() - start)
+
+
+class RequestIdMiddleware:
+    """
+    Tags the request's log records with its X-Request-ID, or a new id when
+    the client or proxy didn't send a usable one, and echoes it back.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        (request_id, token) = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_id.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+    async def __acall__(self, request):
+        (request_id, token) = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_id.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+    def start(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not (0 < len(request_id) <= 64 and request_id.replace('-', '').isalnum()):
+            request_id = uuid4().hex
+        request.request_id = request_id
+        return (request_id, current_request_id.set(request_id))
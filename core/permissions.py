@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """
+    Lets in scrapers that send 'Authorization: Bearer <CORE_METRICS_TOKEN>'.
+    Nobody is let in while the setting is empty.
+    """
+    def has_permission(self, request, view):
+        token = settings.CORE_METRICS_TOKEN
+        (keyword, _, credentials) = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return bool(token) and keyword == 'Bearer' and constant_time_compare(credentials, token)
@@ -0,0 +1,106 @@
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter, time
+from rest_framework.serializers import BaseSerializer
+
+# the sample of the request being handled, None when it isn't sampled
+current_sample = ContextVar('current_sample', default = None)
+
+
+class Sample:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.view = None
+        self.started_at = time()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.total_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'method': self.method,
+            'path': self.path,
+            'started_at': self.started_at,
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 3),
+            'serializer_ms': round(self.serializer_time * 1000, 3),
+            'total_ms': round(self.total_time * 1000, 3),
+        }
+
+
+class SampleBuffer:
+    """The last `size` samples of this process, oldest dropped first."""
+    def __init__(self, size):
+        self.samples = deque(maxlen = size)
+        self.lock = Lock()
+
+    def add(self, sample):
+        with self.lock:
+            self.samples.append(sample.as_dict())
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.samples)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(samples):
+    """Per view name: sample count and the average / p95 / max of each measure."""
+    by_view = {}
+    for sample in samples:
+        by_view.setdefault(sample['view'], []).append(sample)
+    summary = {}
+    for (view, view_samples) in by_view.items():
+        summary[view] = {'samples': len(view_samples)}
+        for measure in ['queries', 'db_ms', 'serializer_ms', 'total_ms']:
+            values = [sample[measure] for sample in view_samples]
+            summary[view][measure] = {
+                'avg': round(sum(values) / len(values), 3),
+                'p95': percentile(values, 0.95),
+                'max': max(values),
+            }
+    return summary
+
+
+_serializer_data = BaseSerializer.data
+
+
+def _timed_serializer_data(self):
+    sample = current_sample.get()
+    if sample is None:
+        return _serializer_data.fget(self)
+    # nested serializers are part of the outermost one's time
+    sample.serializer_depth += 1
+    start = perf_counter()
+    try:
+        return _serializer_data.fget(self)
+    finally:
+        sample.serializer_depth -= 1
+        if sample.serializer_depth == 0:
+            sample.serializer_time += perf_counter() - start
+
+
+def install_serializer_timer():
+    # Serializer.data and ListSerializer.data both end up in BaseSerializer.data
+    BaseSerializer.data = property(_timed_serializer_data)
@@ -1,4 +1,10 @@
 from djoser.serializers import UserSerializer as BaseUserSerializer, UserCreateSerializer as BaseUserCreateSerializer
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer,\
+                                                  TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import add_claims
 
 class UserCreateSerializer(BaseUserCreateSerializer):
     class Meta(BaseUserCreateSerializer.Meta):
@@ -6,4 +12,33 @@ class UserCreateSerializer(BaseUserCreateSerializer):
         
 class UserSerializer(BaseUserSerializer):
     class Meta(BaseUserSerializer.Meta):
-        fields = ['id', 'username', 'password', 'email', 'first_name', 'last_name']
\ No newline at end of file
+        fields = ['id', 'username', 'password', 'email', 'first_name', 'last_name']
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    def validate(self, attrs):
+        # the base class loads the user only to check it may log in. It's loaded
+        # once here instead and also gives the new access token current claims,
+        # the refresh token carries those of the login
+        refresh = self.token_class(attrs['refresh'])
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        data = {'access': str(add_claims(refresh.access_token, user))}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    #the blacklist app isn't installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
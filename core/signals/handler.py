@@ -1,7 +1,68 @@
+from time import perf_counter
+from celery.signals import task_postrun, task_prerun
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from store.models import Customer
 from store.signals.signal import order_created
+from ..authentication import revoke_claims
+from ..metrics import TASK_DURATION
+
+User = get_user_model()
+# task id -> start time, for the tasks running in this worker process
+task_started = {}
 
 
 @receiver(order_created)
 def order_created_signal(sender, **kwargs):
-    print(kwargs['order'])
\ No newline at end of file
+    print(kwargs['order'])
+    
+
+@receiver([post_save, post_delete], sender = User)
+def revoke_user_claims(sender, instance, **kwargs):
+    revoke_claims([instance.pk])
+
+@receiver([post_save, post_delete], sender = Customer)
+def revoke_customer_claims(sender, instance, created = False, **kwargs):
+    # a new customer has no claims yet, the user's post_save already revoked the old ones
+    if not created:
+        revoke_claims([instance.user_id])
+
+@receiver(m2m_changed, sender = User.groups.through)
+@receiver(m2m_changed, sender = User.user_permissions.through)
+def revoke_claims_on_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    if not reverse:
+        revoke_claims([instance.pk])
+    elif action == 'pre_clear':
+        #instance is a group or permission losing all of its users
+        revoke_claims(instance.user_set.values_list('pk', flat = True))
+    else:
+        revoke_claims(pk_set)
+
+@receiver(m2m_changed, sender = Group.permissions.through)
+def revoke_claims_on_group_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+    if not reverse:
+        groups = [instance]
+    elif action == 'pre_clear':
+        #instance is a permission leaving all of its groups
+        groups = instance.group_set.all()
+    else:
+        groups = Group.objects.filter(pk__in = pk_set)
+    revoke_claims(User.objects.filter(groups__in = groups).values_list('pk', flat = True).distinct())
+
+
+@task_prerun.connect
+def start_task_timer(task_id, **kwargs):
+    task_started[task_id] = perf_counter()
+
+
+@task_postrun.connect
+def observe_task_duration(task_id, task, state = None, **kwargs):
+    start = task_started.pop(task_id, None)
+    if start is not None:
+        TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(perf_counter() - start)
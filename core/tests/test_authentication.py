@@ -0,0 +1,117 @@
+import re
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+import pytest
+from model_bakery import baker
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from core.authentication import ClaimsJWTAuthentication, ClaimsUser, add_claims
+from store.customers import customer_cache
+
+
+@pytest.fixture
+def obtain_token(api_client):
+    def do_obtain_token(user):
+        user.set_password('secret')
+        user.save()
+        return api_client.post('/auth/jwt/create/', {'username': user.username, 'password': 'secret'}).data
+    return do_obtain_token
+
+@pytest.fixture
+def authenticate_token():
+    def do_authenticate_token(access):
+        request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'JWT {access}'))
+        (user, _) = ClaimsJWTAuthentication().authenticate(request)
+        return user
+    return do_authenticate_token
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+    def test_if_claims_are_current_user_row_is_not_loaded(self, api_client, obtain_token, query_budget):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        tokens = obtain_token(user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'JWT {tokens["access"]}')
+        api_client.get('/store/order/')
+        
+        with query_budget(1) as queries:
+            response = api_client.get('/store/order/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert 'core_user' not in queries[0]['sql']
+        
+    def test_if_claims_name_the_customer_it_is_not_looked_up(self, api_client, obtain_token, query_budget):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        tokens = obtain_token(user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'JWT {tokens["access"]}')
+        customer_cache.clear()
+        
+        #only the orders query
+        with query_budget(1):
+            response = api_client.get('/store/order/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        
+    def test_if_other_attribute_is_read_user_row_is_loaded_once(self, obtain_token, authenticate_token, django_assert_num_queries):
+        user = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        request_user = authenticate_token(obtain_token(user)['access'])
+        
+        with django_assert_num_queries(0):
+            assert isinstance(request_user, ClaimsUser)
+            assert request_user.id == user.id and request_user.is_staff
+            assert request_user.customer_id == user.customer.id
+        with django_assert_num_queries(1):
+            assert request_user.username == user.username
+            assert request_user.email == user.email
+            
+    def test_if_permission_is_granted_old_claims_are_revoked(self, obtain_token, authenticate_token):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        access = obtain_token(user)['access']
+        
+        user.user_permissions.add(Permission.objects.get(codename='view_history'))
+        request_user = authenticate_token(access)
+        
+        assert not isinstance(request_user, ClaimsUser)
+        assert request_user.has_perm('store.view_history')
+        
+    def test_if_token_is_refreshed_claims_are_current(self, api_client, obtain_token, authenticate_token):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        refresh = obtain_token(user)['refresh']
+        user.user_permissions.add(Permission.objects.get(codename='view_history'))
+        
+        access = api_client.post('/auth/jwt/refresh/', {'refresh': refresh}).data['access']
+        request_user = authenticate_token(access)
+        
+        assert isinstance(request_user, ClaimsUser)
+        assert request_user.has_perm('store.view_history')
+        assert not request_user.has_perm('store.change_product')
+        
+    def test_if_token_is_refreshed_user_row_is_loaded_once(self, api_client, obtain_token, query_budget):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        refresh = obtain_token(user)['refresh']
+        
+        with query_budget(10) as queries:
+            response = api_client.post('/auth/jwt/refresh/', {'refresh': refresh})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len([query for query in queries if re.search(r'FROM [`"]core_user[`"] WHERE', query['sql'])]) == 1
+        
+    def test_if_user_is_deactivated_token_is_rejected(self, api_client, obtain_token):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.credentials(HTTP_AUTHORIZATION=f'JWT {obtain_token(user)["access"]}')
+        
+        user.is_active = False
+        user.save()
+        response = api_client.get('/store/order/')
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        
+    def test_if_claims_say_user_is_inactive_token_is_rejected(self, authenticate_token):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        user.is_active = False
+        access = add_claims(AccessToken.for_user(user), user)
+        
+        with pytest.raises(AuthenticationFailed):
+            authenticate_token(str(access))
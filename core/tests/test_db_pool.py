@@ -0,0 +1,79 @@
+import pytest
+from threading import Timer
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class Connection:
+    def __init__(self):
+        self.closed = False
+        
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool:
+    def test_released_connection_is_reused(self):
+        pool = ConnectionPool(max_size=2)
+        (connection, source) = pool.acquire(Connection)
+        pool.release(connection)
+        
+        (reused, source) = pool.acquire(Connection)
+        
+        assert reused is connection
+        assert source == 'pool'
+        
+    def test_if_pool_is_empty_a_new_connection_is_opened(self):
+        pool = ConnectionPool(max_size=2)
+        
+        (connection, source) = pool.acquire(Connection)
+        
+        assert source == 'new'
+        
+    def test_if_max_size_is_checked_out_acquire_times_out(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        pool.acquire(Connection)
+        
+        with pytest.raises(PoolTimeout):
+            pool.acquire(Connection)
+        
+    def test_if_max_size_is_checked_out_acquire_waits_for_a_release(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        (connection, source) = pool.acquire(Connection)
+        Timer(0.05, pool.release, [connection]).start()
+        
+        (reused, source) = pool.acquire(Connection)
+        
+        assert reused is connection
+        assert source == 'pool'
+        
+    def test_discarded_connection_frees_its_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        (connection, source) = pool.acquire(Connection)
+        pool.discard(connection)
+        
+        (replacement, source) = pool.acquire(Connection)
+        
+        assert connection.closed
+        assert source == 'new'
+        
+    def test_if_connect_fails_its_slot_is_freed(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        def refuse():
+            raise OSError('refused')
+        with pytest.raises(OSError):
+            pool.acquire(refuse)
+        
+        (connection, source) = pool.acquire(Connection)
+        
+        assert source == 'new'
+        
+    def test_if_idle_connection_is_unusable_it_is_replaced(self):
+        pool = ConnectionPool(max_size=1, check_after=0, is_usable=lambda connection: False)
+        (connection, source) = pool.acquire(Connection)
+        pool.release(connection)
+        
+        (replacement, source) = pool.acquire(Connection)
+        
+        assert replacement is not connection
+        assert connection.closed
+        assert source == 'new'
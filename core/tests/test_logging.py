@@ -0,0 +1,69 @@
+import json
+import logging
+from queue import SimpleQueue
+import pytest
+from core.logs import BatchedRotatingFileHandler, BatchingQueueListener, JsonFormatter, QueuedHandler, RequestIdFilter, current_request_id
+
+
+@pytest.fixture
+def queued_logger(tmp_path):
+    logger = logging.getLogger('store.tests.queued')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    queue = SimpleQueue()
+    listeners = []
+    def do_queued_logger(formatter, max_bytes=0):
+        handler = BatchedRotatingFileHandler(tmp_path / 'test.log', maxBytes=max_bytes, backupCount=2)
+        handler.setFormatter(formatter)
+        queued = QueuedHandler(queue)
+        queued.addFilter(RequestIdFilter())
+        logger.handlers = [queued]
+        listener = BatchingQueueListener(queue, handler, batch_size=10)
+        listener.start()
+        listeners.append((listener, handler))
+        return (logger, listener)
+    yield do_queued_logger
+    for (listener, handler) in listeners:
+        if listener._thread is not None:
+            listener.stop()
+        handler.close()
+    logger.handlers = []
+    logger.propagate = True
+
+@pytest.mark.django_db
+class TestRequestId:
+    def test_request_id_is_echoed_back(self, api_client):
+        response = api_client.get('/store/collections/', HTTP_X_REQUEST_ID='abc-123')
+        
+        assert response['X-Request-ID'] == 'abc-123'
+        
+    def test_if_request_id_is_not_usable_a_new_one_is_made(self, api_client):
+        response = api_client.get('/store/collections/', HTTP_X_REQUEST_ID='not usable!')
+        
+        assert response['X-Request-ID'] != 'not usable!'
+        assert len(response['X-Request-ID']) == 32
+
+
+class TestQueuedLogging:
+    def test_records_are_written_as_json_with_request_id(self, queued_logger, tmp_path):
+        (logger, listener) = queued_logger(JsonFormatter())
+        token = current_request_id.set('abc-123')
+        
+        for line in range(25):
+            logger.info('line %d', line)
+        current_request_id.reset(token)
+        listener.stop()
+        
+        entries = [json.loads(line) for line in (tmp_path / 'test.log').read_text().splitlines()]
+        assert [entry['message'] for entry in entries] == [f'line {line}' for line in range(25)]
+        assert {entry['request_id'] for entry in entries} == {'abc-123'}
+        
+    def test_file_is_rotated_by_size(self, queued_logger, tmp_path):
+        (logger, listener) = queued_logger(logging.Formatter('{message}', style='{'), max_bytes=200)
+        
+        for line in range(50):
+            logger.info('x' * 20)
+        listener.stop()
+        
+        assert (tmp_path / 'test.log.1').exists()
+        assert len((tmp_path / 'test.log').read_text()) <= 200
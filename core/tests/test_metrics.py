@@ -0,0 +1,93 @@
+from rest_framework import status
+import pytest
+from urllib.request import urlopen
+from model_bakery import baker
+from prometheus_client import REGISTRY
+from core.metrics import serve
+from store.models import Product
+
+
+def sample_value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+@pytest.mark.django_db
+class TestMetrics:
+    def test_request_latency_and_queries_are_recorded_by_route(self, api_client):
+        baker.make(Product, unit_price=10, _quantity=3)
+        requests = sample_value('http_request_duration_seconds_count', route='products-list', method='GET', status='200')
+        queries = sample_value('http_request_db_queries_sum', route='products-list')
+        
+        api_client.get('/store/products/')
+        
+        assert sample_value('http_request_duration_seconds_count', route='products-list', method='GET', status='200') == requests + 1
+        assert sample_value('http_request_db_queries_sum', route='products-list') > queries
+        
+    def test_product_cache_hits_and_misses_are_counted(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        misses = sample_value('cache_requests_total', cache='product_detail', result='miss')
+        hits = sample_value('cache_requests_total', cache='product_detail', result='hit')
+        
+        api_client.get(f'/store/products/{product.id}/')
+        api_client.get(f'/store/products/{product.id}/')
+        
+        assert sample_value('cache_requests_total', cache='product_detail', result='miss') == misses + 1
+        assert sample_value('cache_requests_total', cache='product_detail', result='hit') == hits + 1
+        
+    def test_task_durations_are_recorded(self, monkeypatch):
+        from playground.tasks import notify_customers, send_notifications
+        #runs the task here, without a broker for it or its chunks
+        monkeypatch.setattr(send_notifications, 'delay', lambda *args: None)
+        runs = sample_value('celery_task_duration_seconds_count', task=notify_customers.name, state='SUCCESS')
+        
+        notify_customers.apply(('Hello',), {'campaign': 'metrics-test'})
+        
+        assert sample_value('celery_task_duration_seconds_count', task=notify_customers.name, state='SUCCESS') == runs + 1
+        
+    def test_worker_serves_its_task_durations(self, monkeypatch):
+        from playground.tasks import notify_customers, send_notifications
+        monkeypatch.setattr(send_notifications, 'delay', lambda *args: None)
+        notify_customers.apply(('Hello',), {'campaign': 'metrics-worker-test'})
+        
+        (server, thread) = serve(0)
+        try:
+            body = urlopen(f'http://127.0.0.1:{server.server_port}/metrics').read()
+        finally:
+            server.shutdown()
+        
+        assert f'celery_task_duration_seconds_count{{state="SUCCESS",task="{notify_customers.name}"}}'.encode() in body
+        
+    def test_if_user_is_anonymous_metrics_returns_401(self, api_client):
+        response = api_client.get('/metrics')
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        
+    def test_if_user_is_not_admin_metrics_returns_403(self, api_client, force_authentication):
+        force_authentication(is_staff=False)
+        
+        response = api_client.get('/metrics')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        
+    def test_if_token_is_wrong_metrics_returns_401(self, api_client, settings):
+        settings.CORE_METRICS_TOKEN = 'scraper'
+        
+        response = api_client.get('/metrics', HTTP_AUTHORIZATION='Bearer guess')
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        
+    def test_if_token_is_right_metrics_returns_200(self, api_client, settings):
+        settings.CORE_METRICS_TOKEN = 'scraper'
+        
+        response = api_client.get('/metrics', HTTP_AUTHORIZATION='Bearer scraper')
+        
+        assert response.status_code == status.HTTP_200_OK
+        
+    def test_metrics_are_exported_as_text(self, api_client, force_authentication):
+        api_client.get('/store/products/')
+        force_authentication()
+        
+        response = api_client.get('/metrics')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain')
+        assert b'http_request_duration_seconds_bucket{' in response.content
@@ -0,0 +1,45 @@
+from rest_framework import status
+import pytest
+from model_bakery import baker
+from core.middleware import profiles
+from store.models import Product
+
+
+@pytest.fixture
+def sample_rate(settings):
+    profiles.clear()
+    def do_sample_rate(rate):
+        settings.CORE_PROFILER_SAMPLE_RATE = rate
+    yield do_sample_rate
+    profiles.clear()
+
+@pytest.mark.django_db
+class TestSamplingProfiler:
+    def test_if_request_is_sampled_its_view_is_profiled(self, api_client, force_authentication, sample_rate):
+        sample_rate(1)
+        baker.make(Product, unit_price=10, _quantity=3)
+        api_client.get('/store/products/')
+        force_authentication(is_staff=True)
+        
+        response = api_client.get('/profiler/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        products = response.data['views']['products-list']
+        assert products['samples'] == 1
+        assert products['queries']['max'] >= 1
+        assert products['serializer_ms']['max'] > 0
+        assert products['total_ms']['max'] >= products['db_ms']['max']
+        
+    def test_if_sample_rate_is_zero_nothing_is_recorded(self, api_client, sample_rate):
+        sample_rate(0)
+        
+        api_client.get('/store/products/')
+        
+        assert profiles.snapshot() == []
+        
+    def test_if_user_is_not_admin_returns_403(self, api_client, force_authentication, sample_rate):
+        force_authentication(is_staff=False)
+        
+        response = api_client.get('/profiler/')
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
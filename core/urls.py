@@ -1,6 +1,9 @@
 from django.urls import path
 from django.views.generic import TemplateView
+from . import views
 
 urlpatterns = [
-    path('', TemplateView.as_view(template_name='core/index.html'))
+    path('', TemplateView.as_view(template_name='core/index.html')),
+    path('profiler/', views.ProfilerView.as_view()),
+    path('metrics', views.MetricsView.as_view()),
 ]
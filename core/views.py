@@ -1,3 +1,28 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .metrics import export
+from .middleware import profiles
+from .permissions import HasMetricsToken
+from .profiling import summarize
 
-# Create your views here.
+
+class ProfilerView(APIView):
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        samples = profiles.snapshot()
+        return Response({
+            'views': summarize(samples),
+            'recent': samples[-50:],
+        })
+
+
+class MetricsView(APIView):
+    # staff can look at it from the browser, Prometheus scrapes it with the token
+    permission_classes = [IsAdminUser | HasMetricsToken]
+    
+    def get(self, request):
+        (body, content_type) = export()
+        return HttpResponse(body, content_type = content_type)
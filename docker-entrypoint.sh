@@ -4,6 +4,10 @@
 echo "Apply database migrations"
 python manage.py migrate
 
-# Start server
+# Start server, STOREFRONT_SERVER=gunicorn serves with storefront/serving.py
+if [ "$STOREFRONT_SERVER" = "gunicorn" ]; then
+    echo "Starting gunicorn with ${STOREFRONT_WORKER_CLASS:-gthread} workers"
+    exec gunicorn -c python:storefront.serving
+fi
 echo "Starting server"
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+python manage.py runserver 0.0.0.0:8000
@@ -4,8 +4,27 @@ from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
+class LikedItemManager(models.Manager):
+    
+    def count_for(self, obj_type, obj_id):
+        return self.count_for_many(obj_type, [obj_id]).get(obj_id, 0)
+    
+    def count_for_many(self, obj_type, obj_ids):
+        # get_for_model is served from ContentTypeManager's per process cache after the first call
+        content_type = ContentType.objects.get_for_model(obj_type)
+        return dict(LikedItem.objects
+                    .filter(content_type = content_type, object_id__in = list(obj_ids))
+                    .order_by()
+                    .values('object_id')
+                    .annotate(count = models.Count('id'))
+                    .values_list('object_id', 'count'))
+
 class LikedItem(models.Model):
+    objects = LikedItemManager()
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete = models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete = models.CASCADE )
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+    
+    class Meta:
+        indexes = [models.Index(fields = ['content_type', 'object_id'])]
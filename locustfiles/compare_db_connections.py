@@ -0,0 +1,37 @@
+"""
+Compares requests/s and latency of the browse scenario in browse_products.py
+with a connection per request, persistent connections and the connection
+pool of core.db.mysql.
+
+    python locustfiles/compare_db_connections.py --users 200 --run-time 60s
+
+Each mode is served by gunicorn with storefront/serving.py, the worker model
+comes from STOREFRONT_WORKER_CLASS as usual. Under uvicorn the persistent
+mode leaves a connection open per request thread, watch MySQL's
+max_connections when running it there.
+"""
+
+import argparse
+import os
+import sys
+from compare_workers import add_arguments, print_results, run
+
+BROWSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'browse_products.py')
+
+MODES = {
+    'per_request': {'DB_CONN_MAX_AGE': '0', 'DB_POOL_SIZE': '0'},
+    'persistent': {'DB_CONN_MAX_AGE': '60', 'DB_POOL_SIZE': '0'},
+    'pooled': {'DB_POOL_SIZE': '10'},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the DB connection modes on the browse scenario')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    add_arguments(parser)
+    options = parser.parse_args()
+    print_results({mode: run(mode, options, MODES[mode], BROWSE) for mode in options.modes})
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Compares throughput and p99 latency of the gunicorn worker models in
+storefront/serving.py on the browse scenario.
+
+    python locustfiles/compare_workers.py --users 100 --run-time 60s
+
+starts gunicorn with each worker model in turn, runs this file headless
+against it and prints the aggregated requests/s and p99 of every model.
+It can also be run against an already running server:
+
+    locust -f locustfiles/compare_workers.py --host http://localhost:8000
+"""
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from random import randint
+from locust import HttpUser, task, constant
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BrowseUser(HttpUser):
+    # no think time, each user sends its next request as soon as the last one is answered
+    wait_time = constant(0)
+
+    @task(weight=2)
+    def view_products_collection(self):
+        collection_id = randint(2,5)
+
+        self.client.get(f'/store/products/?collection_id={collection_id}',
+                        name='/store/products/')
+
+    @task(weight=4)
+    def view_products(self):
+        product_id = randint(1,100)
+
+        self.client.get(f'/store/products/{product_id}/',
+                        name='/store/products/:id')
+
+    @task(weight=1)
+    def view_collections(self):
+        self.client.get('/store/collections/',
+                        name='/store/collections/')
+
+    @task(weight=2)
+    def say_hello_async(self):
+        self.client.get('/playground/hello/async/',
+                        name='/playground/hello/async')
+
+
+def wait_until_up(url, seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f'{url} did not come up in {seconds}s')
+
+
+def run(name, options, env, locustfile=__file__):
+    """Serves storefront with gunicorn under env, runs locustfile against it and returns the aggregated stats."""
+    host = f'127.0.0.1:{options.port}'
+    env = dict(os.environ, GUNICORN_BIND=host, **env)
+    server = subprocess.Popen(['gunicorn', '-c', 'python:storefront.serving'], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    prefix = os.path.join(options.output, name)
+    try:
+        wait_until_up(f'http://{host}/store/collections/', 60)
+        subprocess.run(['locust', '-f', os.path.abspath(locustfile), '--headless',
+                        '--host', f'http://{host}', '--users', str(options.users),
+                        '--spawn-rate', str(options.users), '--run-time', options.run_time,
+                        '--csv', prefix, '--only-summary'],
+                       check=False)
+    finally:
+        server.terminate()
+        server.wait()
+    with open(f'{prefix}_stats.csv') as file:
+        for row in csv.DictReader(file):
+            if row['Name'] == 'Aggregated':
+                return row
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--run-time', default='60s')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--output', default=tempfile.gettempdir(), help='directory of the locust csv files')
+
+
+def print_results(results):
+    print(f'{"":<12} {"requests/s":>11} {"failures/s":>11} {"median ms":>10} {"p99 ms":>8}')
+    for (name, row) in results.items():
+        print(f'{name:<12} {float(row["Requests/s"]):11.1f} {float(row["Failures/s"]):11.1f} '
+              f'{row["50%"]:>10} {row["99%"]:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the gunicorn worker models of storefront/serving.py')
+    parser.add_argument('--models', nargs='+', default=['gthread', 'uvicorn'])
+    add_arguments(parser)
+    options = parser.parse_args()
+    print_results({model: run(model, options, {'STOREFRONT_WORKER_CLASS': model}) for model in options.models})
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,79 @@
-from time import sleep
+import logging
+from hashlib import sha1
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from store.models import Customer
+
+logger = logging.getLogger(__name__)
+
+
+def campaign_key(campaign):
+    return f'playground:campaign:{campaign}'
+
+
+def fanout_key(campaign):
+    return f'playground:campaign:{campaign}:fanout'
+
+
+def chunk_key(campaign, chunk):
+    return f'playground:campaign:{campaign}:chunk:{chunk}'
 
 
 @shared_task
-def notify_customers(message):
-    print('sending 10k emails')
-    print(message)
-    sleep(10)
-    print('succed!')
+def notify_customers(message, campaign=None, chunk_size=None):
+    """
+    Fans the message out to every customer in chunks covering chunk_size
+    customer ids each. The ranges don't move when customers are added or
+    removed, so a chunk stays the same chunk across reruns. A campaign is only marked as sent once its last chunk is queued, so a run
+    that fails partway is finished by the next one, whose already delivered
+    chunks are skipped by send_notifications. Overlapping runs of the same
+    campaign (by default the message and today's date) don't fan out twice.
+    """
+    chunk_size = chunk_size or settings.NOTIFY_CUSTOMERS_CHUNK_SIZE
+    campaign = campaign or f'{timezone.localdate()}:{sha1(message.encode()).hexdigest()[:12]}'
+    if cache.get(campaign_key(campaign)):
+        logger.info('Campaign %s was already sent, skipping', campaign)
+        return 0
+    if not cache.add(fanout_key(campaign), True, timeout=settings.NOTIFY_CUSTOMERS_FANOUT_TIMEOUT):
+        logger.info('Campaign %s is being sent by another run, skipping', campaign)
+        return 0
+    try:
+        customers = Customer.objects.exclude(user__email='')\
+            .order_by('pk')\
+            .values_list('pk', 'user__email')\
+            .iterator(chunk_size=chunk_size)
+        chunks = 0
+        chunk = []
+        for (pk, email) in customers:
+            start = pk - pk % chunk_size
+            if chunk and start != chunk_start:
+                send_notifications.delay(message, chunk, campaign, f'{chunk_start}-{chunk_start + chunk_size - 1}')
+                chunks += 1
+                chunk = []
+            chunk_start = start
+            chunk.append(email)
+        if chunk:
+            send_notifications.delay(message, chunk, campaign, f'{chunk_start}-{chunk_start + chunk_size - 1}')
+            chunks += 1
+        cache.set(campaign_key(campaign), True, timeout=settings.NOTIFY_CUSTOMERS_CAMPAIGN_TTL)
+    finally:
+        cache.delete(fanout_key(campaign))
+    logger.info('Campaign %s queued in %d chunks', campaign, chunks)
+    return chunks
+
+
+@shared_task(rate_limit=settings.NOTIFY_CUSTOMERS_RATE_LIMIT,
+             autoretry_for=(OSError,), retry_backoff=True, max_retries=5)
+def send_notifications(message, emails, campaign, chunk):
+    # a chunk that was delivered and then redelivered by the broker isn't sent again
+    if cache.get(chunk_key(campaign, chunk)):
+        return 0
+    messages = [EmailMessage(subject='Storefront', body=message, to=[email]) for email in emails]
+    # one SMTP session for the whole chunk
+    with get_connection() as connection:
+        sent = connection.send_messages(messages)
+    cache.set(chunk_key(campaign, chunk), True, timeout=settings.NOTIFY_CUSTOMERS_CAMPAIGN_TTL)
+    return sent
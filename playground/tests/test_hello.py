@@ -0,0 +1,71 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from django.test import AsyncClient, Client
+from playground import upstream as upstream_module
+
+
+@pytest.fixture
+def upstream(settings):
+    #a local stand-in for httpbin's /delay endpoint that counts its calls
+    class Handler(BaseHTTPRequestHandler):
+        calls = 0
+        
+        def do_POST(self):
+            Handler.calls += 1
+            time.sleep(0.2)
+            body = json.dumps({'ok': True}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.HELLO_UPSTREAM_URL = f'http://127.0.0.1:{server.server_port}/delay/2'
+    yield Handler
+    server.shutdown()
+    server.server_close()
+
+class TestHelloAsync:
+    def test_if_misses_are_concurrent_upstream_is_called_once(self, upstream):
+        async def say_hello(times):
+            client = AsyncClient()
+            return await asyncio.gather(*[client.get('/playground/hello/async/') for _ in range(times)])
+        
+        responses = asyncio.run(say_hello(5))
+        
+        assert [response.status_code for response in responses] == [200] * 5
+        assert upstream.calls == 1
+        
+    def test_if_answer_is_cached_upstream_is_not_called_again(self, upstream):
+        asyncio.run(AsyncClient().get('/playground/hello/async/'))
+        
+        response = asyncio.run(AsyncClient().get('/playground/hello/async/'))
+        
+        assert response.status_code == 200
+        assert upstream.calls == 1
+        
+    def test_if_wsgi_requests_miss_together_upstream_is_called_once(self, upstream):
+        #each request runs the view through async_to_sync, on a loop of its own
+        with ThreadPoolExecutor(5) as executor:
+            responses = list(executor.map(lambda _: Client().get('/playground/hello/async/'), range(5)))
+        
+        assert [response.status_code for response in responses] == [200] * 5
+        assert upstream.calls == 1
+        
+    def test_if_process_exits_client_is_closed(self, upstream):
+        asyncio.run(AsyncClient().get('/playground/hello/async/'))
+        client = upstream_module._client
+        
+        upstream_module.close()
+        
+        assert client.is_closed
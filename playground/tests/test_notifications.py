@@ -0,0 +1,77 @@
+from collections import Counter
+from django.conf import settings
+import pytest
+from model_bakery import baker
+from playground.tasks import notify_customers, send_notifications
+
+
+@pytest.fixture(autouse=True)
+def send_inline(monkeypatch):
+    monkeypatch.setattr(send_notifications, 'delay', lambda *args: send_notifications(*args))
+
+@pytest.mark.django_db
+class TestNotifyCustomers:
+    def test_if_campaign_is_sent_every_customer_gets_one_email(self, mailoutbox):
+        users = baker.make(settings.AUTH_USER_MODEL, email=iter(f'{n}@storefront.local' for n in range(5)), _quantity=5)
+        
+        chunks = notify_customers('Hello World', campaign='spring', chunk_size=2)
+        
+        assert chunks == len({user.customer.pk // 2 for user in users})
+        assert sorted(email.to[0] for email in mailoutbox) == sorted(user.email for user in users)
+        
+    def test_if_campaign_runs_again_nothing_is_sent(self, mailoutbox):
+        baker.make(settings.AUTH_USER_MODEL, email=iter(f'{n}@storefront.local' for n in range(3)), _quantity=3)
+        notify_customers('Hello World', campaign='spring')
+        
+        chunks = notify_customers('Hello World', campaign='spring')
+        
+        assert chunks == 0
+        assert len(mailoutbox) == 3
+        
+    def test_if_fan_out_fails_partway_next_run_sends_the_rest(self, mailoutbox, monkeypatch):
+        users = baker.make(settings.AUTH_USER_MODEL, email=iter(f'{n}@storefront.local' for n in range(5)), _quantity=5)
+        queued = []
+        def queue_then_fail(*args):
+            if queued:
+                raise OSError('broker unreachable')
+            queued.append(args)
+            send_notifications(*args)
+        monkeypatch.setattr(send_notifications, 'delay', queue_then_fail)
+        with pytest.raises(OSError):
+            notify_customers('Hello World', campaign='spring', chunk_size=2)
+        monkeypatch.setattr(send_notifications, 'delay', lambda *args: send_notifications(*args))
+        
+        notify_customers('Hello World', campaign='spring', chunk_size=2)
+        
+        assert sorted(email.to[0] for email in mailoutbox) == sorted(user.email for user in users)
+        
+    def test_if_customers_change_before_a_rerun_each_gets_one_email(self, mailoutbox, monkeypatch):
+        users = baker.make(settings.AUTH_USER_MODEL, email=iter(f'{n}@storefront.local' for n in range(6)), _quantity=6)
+        queued = []
+        def queue_then_fail(*args):
+            if queued:
+                raise OSError('broker unreachable')
+            queued.append(args)
+            send_notifications(*args)
+        monkeypatch.setattr(send_notifications, 'delay', queue_then_fail)
+        with pytest.raises(OSError):
+            notify_customers('Hello World', campaign='spring', chunk_size=2)
+        #ids before and inside the remaining chunks shift
+        first = min(users, key=lambda user: user.customer.pk)
+        first.delete()
+        baker.make(settings.AUTH_USER_MODEL, email='new@storefront.local')
+        monkeypatch.setattr(send_notifications, 'delay', lambda *args: send_notifications(*args))
+        
+        notify_customers('Hello World', campaign='spring', chunk_size=2)
+        
+        sent = Counter(email.to[0] for email in mailoutbox)
+        assert set(sent.values()) == {1}
+        assert set(sent) == {user.email for user in users} | {'new@storefront.local'}
+        
+    def test_if_chunk_is_redelivered_it_is_not_sent_again(self, mailoutbox):
+        send_notifications('Hello World', ['a@storefront.local'], 'spring', '0-99')
+        
+        sent = send_notifications('Hello World', ['a@storefront.local'], 'spring', '0-99')
+        
+        assert sent == 0
+        assert len(mailoutbox) == 1
@@ -0,0 +1,87 @@
+import asyncio
+import atexit
+import os
+import threading
+from hashlib import md5
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+# the pooled client and the table of in-flight fetches live on one long-lived
+# loop per process. Under ASGI every worker runs a loop of its own, but under
+# the WSGI workers async_to_sync starts a new loop for every request, and a
+# client or table tied to the caller's loop would never be shared
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+_client = None
+_inflight = {}
+
+
+def upstream_key(method, url):
+    return f'playground:upstream:{method}:{md5(url.encode()).hexdigest()}'
+
+
+def get_loop():
+    """The process' upstream loop, started in a daemon thread on first use."""
+    global _loop, _loop_pid, _client
+    with _loop_lock:
+        # a forked worker doesn't get the parent's thread, only its loop object
+        if _loop is None or _loop_pid != os.getpid():
+            (_loop, _loop_pid, _client) = (asyncio.new_event_loop(), os.getpid(), None)
+            _inflight.clear()
+            threading.Thread(target=_loop.run_forever, name='upstream', daemon=True).start()
+        return _loop
+
+
+def get_client():
+    # only called on the upstream loop
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HELLO_UPSTREAM_TIMEOUT, connect=settings.HELLO_UPSTREAM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=settings.HELLO_UPSTREAM_MAX_CONNECTIONS))
+    return _client
+
+
+@atexit.register
+def close():
+    global _client
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or _client is None:
+            return
+        asyncio.run_coroutine_threadsafe(_client.aclose(), _loop).result(timeout=5)
+        _client = None
+
+
+async def fetch_json(method, url, timeout):
+    """
+    The upstream's JSON answer, cached for timeout seconds. Concurrent misses
+    for the same call share a single upstream request, whichever loop they
+    come from.
+    """
+    cached = await cache.aget(upstream_key(method, url))
+    if cached is not None:
+        return cached
+    future = asyncio.run_coroutine_threadsafe(_join(method, url), get_loop())
+    result = await asyncio.wrap_future(future)
+    # cached from the caller's loop, Django's async cache calls hop to the
+    # caller's threads and would block if awaited on the upstream loop
+    await cache.aset(upstream_key(method, url), result, timeout)
+    return result
+
+
+async def _join(method, url):
+    key = (method, url)
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.ensure_future(_fetch(method, url))
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shielded, a client disconnecting doesn't cancel the fetch the others wait on
+    return await asyncio.shield(task)
+
+
+async def _fetch(method, url):
+    response = await get_client().request(method, url)
+    response.raise_for_status()
+    return response.json()
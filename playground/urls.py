@@ -2,5 +2,6 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('hello/', views.HelloViewSet.as_view())
+    path('hello/', views.HelloViewSet.as_view()),
+    path('hello/async/', views.hello_async),
 ]
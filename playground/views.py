@@ -1,14 +1,21 @@
+from django.conf import settings
 from django.shortcuts import render
 from django.core.cache import cache
 from django.views.decorators.cache import cache_page
 import requests
 from rest_framework.views import APIView
 from django.utils.decorators import method_decorator
+from .upstream import fetch_json
 
 class HelloViewSet(APIView):
     @method_decorator(cache_page(10 * 60))
     def get(self, request):
-        response = requests.post('https://httpbin.org/delay/2')
+        response = requests.post(settings.HELLO_UPSTREAM_URL)
         result = response.json()
-        return render(request, 'hello.html', {'name' :'Amir'})       
-    
+        return render(request, 'hello.html', {'name' :'Amir'})
+
+
+async def hello_async(request):
+    # served by storefront.asgi, the worker keeps handling requests while the upstream call is pending
+    result = await fetch_json('POST', settings.HELLO_UPSTREAM_URL, 10 * 60)
+    return render(request, 'hello.html', {'name' :'Amir'})
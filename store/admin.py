@@ -6,7 +6,9 @@ from store.models import Collection, Product, Customer, Order
 from typing import Any
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
+from django.core.files.storage import default_storage
 from . import models
+from .signals.signal import products_updated
 
 
 class ProductInventory(admin.SimpleListFilter):
@@ -29,8 +31,11 @@ class ProductImageInline(admin.TabularInline):
     readonly_fields = ['thumbnail']
     
     def thumbnail(self, instance):
+        if 'thumbnail' in instance.renditions:
+            url = default_storage.url(instance.renditions['thumbnail']['jpeg'])
+            return format_html('<image src= "{}" class = "thumbnail" />', url)
         if instance.image.name != '':
-            return format_html(f'<image src= "{instance.image.url}" class = "thumbnail" />')
+            return 'Processing...'
         return ''
 
 @admin.register(Product)
@@ -55,7 +60,9 @@ class ProductAdmin(admin.ModelAdmin):
             return 'Low'
         return 'Ok'
     def clear_inventory(self, request, queryset):
+        product_ids = list(queryset.values_list('pk', flat = True))
         inventory_count = queryset.update(inventory = 0)
+        products_updated.send(self.__class__, product_ids = product_ids)
         self.message_user(
             request,
             f'{inventory_count} products were updated successfully',
@@ -111,9 +118,10 @@ class OrderAdmin(admin.ModelAdmin):
 class CollectionAdmin(admin.ModelAdmin):
     list_display = ['name', 'product_counter']
     list_per_page = 10
+    readonly_fields = ['products_count']
     search_fields = ['name__istartswith']
     
-    @admin.display(ordering= 'product_counter')
+    @admin.display(ordering= 'products_count')
     def product_counter(self, collection):
         url = (
                 reverse('admin:store_product_changelist')
@@ -121,11 +129,5 @@ class CollectionAdmin(admin.ModelAdmin):
                + urlencode({
                    'collection__id': str(collection.id)
                }))
-        return format_html('<a href= {}>{}</a>', url, collection.product_counter)
-        
-    
-    def get_queryset(self, request: HttpRequest) -> QuerySet[Any]:
-        return super().get_queryset(request).annotate(
-            product_counter = Count('products')
-        )
+        return format_html('<a href= {}>{}</a>', url, collection.products_count)
 
@@ -0,0 +1,79 @@
+from hashlib import md5
+from time import time_ns
+from django.core.cache import cache
+from django.db import transaction
+
+PRODUCT_CACHE_TIMEOUT = 10 * 60
+
+CATALOG_VERSION_KEY = 'store:version:catalog'
+# lists asked for with ?include= also depend on tags and likes, which change
+# far more often than the products themselves
+RELATIONS_VERSION_KEY = 'store:version:relations'
+
+
+def product_version_key(product_id):
+    return f'store:version:product:{product_id}'
+
+
+def collection_version_key(collection_id):
+    return f'store:version:collection:{collection_id}'
+
+
+def get_version(key):
+    # versions never expire on their own, a missing one (evicted or never set)
+    # starts from the current time so it can't collide with an older value
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time_ns(), None)
+
+
+def bump_versions_on_commit(keys):
+    # again on commit, a read racing the transaction may have cached the old
+    # rows under the first bump
+    bump_versions(keys)
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+def invalidate_products(product_ids, collection_ids):
+    keys = [product_version_key(pk) for pk in product_ids]
+    keys += [collection_version_key(pk) for pk in collection_ids]
+    keys.append(CATALOG_VERSION_KEY)
+    bump_versions_on_commit(keys)
+
+
+def invalidate_product_relations(product_ids):
+    """Drops the products' details and the lists with ?include=, the others stay cached."""
+    keys = [product_version_key(pk) for pk in product_ids]
+    keys.append(RELATIONS_VERSION_KEY)
+    bump_versions_on_commit(keys)
+
+
+def _params_digest(request):
+    params = sorted(request.query_params.lists())
+    return md5(f'{request.get_host()}|{params}'.encode()).hexdigest()
+
+
+def product_list_key(request):
+    collection_id = request.query_params.get('collection_id')
+    if collection_id:
+        version = get_version(collection_version_key(collection_id))
+    else:
+        version = get_version(CATALOG_VERSION_KEY)
+    if request.query_params.get('include'):
+        version = f'{version}.{get_version(RELATIONS_VERSION_KEY)}'
+    return f'store:products:list:{version}:{_params_digest(request)}'
+
+
+def product_detail_key(request, product_id):
+    version = get_version(product_version_key(product_id))
+    return f'store:products:detail:{product_id}:{version}:{_params_digest(request)}'
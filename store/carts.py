@@ -0,0 +1,252 @@
+from uuid import UUID, uuid4
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+from .models import Cart, CartItem, Product
+
+
+def get_cart_store():
+    return import_string(settings.STORE_CART_ENGINE)()
+
+
+def quantity_overflow_error(product_id):
+    return ValidationError({'quantity': [f'Quantity of product {product_id} would go over {CartItem.max_quantity}.']})
+
+
+def parse_cart_id(cart_id):
+    try:
+        return UUID(str(cart_id))
+    except ValueError:
+        return None
+
+
+class DatabaseCartStore:
+    """Carts as Cart/CartItem rows."""
+    def create(self):
+        return Cart.objects.create()
+
+    def exists(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        return cart_id is not None and Cart.objects.filter(pk = cart_id).exists()
+
+    def get(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return None
+        return Cart.objects.prefetch_related('items__product').filter(pk = cart_id).first()
+
+    def delete(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return False
+        # the items have no signals or dependents of their own, the collector
+        # deletes them with a single query on the way to the cart
+        (_, deleted) = Cart.objects.filter(pk = cart_id).delete()
+        return deleted.get(Cart._meta.label, 0) > 0
+
+    def get_items(self, cart_id):
+        return list(CartItem.objects.filter(cart_id = cart_id).select_related('product'))
+
+    def get_quantities(self, cart_id):
+        return dict(CartItem.objects.filter(cart_id = cart_id).values_list('product_id', 'quantity'))
+
+    def get_item(self, cart_id, item_id):
+        return CartItem.objects.filter(cart_id = cart_id, pk = item_id).select_related('product').first()
+
+    def add_item(self, cart_id, product_id, quantity):
+        if not CartItem.objects.add_product(cart_id, product_id, quantity):
+            return None
+        return CartItem.objects.get(product_id = product_id, cart_id = cart_id)
+
+    def set_quantity(self, item, quantity):
+        item.quantity = quantity
+        item.save(update_fields = ['quantity'])
+        return item
+
+    def remove_item(self, item):
+        item.delete()
+
+    def apply_batch(self, cart_id, added, quantities, deleted):
+        with transaction.atomic():
+            if deleted:
+                CartItem.objects.filter(cart_id = cart_id, product_id__in = deleted).delete()
+            if added:
+                current = dict(CartItem.objects.select_for_update()
+                               .filter(cart_id = cart_id, product_id__in = added)
+                               .values_list('product_id', 'quantity'))
+                for (product_id, quantity) in added.items():
+                    quantities[product_id] = current.get(product_id, 0) + quantity
+                    # checked under the row lock, raising rolls back the deletes too
+                    if quantities[product_id] > CartItem.max_quantity:
+                        raise quantity_overflow_error(product_id)
+            if quantities:
+                # MySQL upserts on the unique key and doesn't take an explicit conflict target
+                unique_fields = ['product', 'cart'] if connection.features.supports_update_conflicts_with_target else None
+                CartItem.objects.bulk_create(
+                    [CartItem(cart_id = cart_id, product_id = product_id, quantity = quantity)
+                     for (product_id, quantity) in quantities.items()],
+                    update_conflicts = True,
+                    unique_fields = unique_fields,
+                    update_fields = ['quantity'])
+        return self.get_items(cart_id)
+
+
+class RedisCartStore:
+    """
+    Carts as Redis hashes of product id -> quantity that expire after
+    STORE_CART_TTL seconds without a write. Nothing reaches the database
+    until checkout turns the items into OrderItem rows. Items are
+    identified by their product id.
+    """
+    created_field = 'created_at'
+
+    # only touch carts that still exist, so a late write can't revive an expired cart
+    increment_script = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then return nil end
+        local quantity = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+        if quantity > tonumber(ARGV[4]) then
+            quantity = tonumber(ARGV[4])
+            redis.call('HSET', KEYS[1], ARGV[1], quantity)
+        end
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+        return quantity
+    """
+    set_script = """
+        if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then return nil end
+        redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+        redis.call('EXPIRE', KEYS[1], ARGV[3])
+        return tonumber(ARGV[2])
+    """
+    # ARGV: ttl, max quantity, delete count, set count, the deleted ids, then
+    # product id and quantity pairs, first those to set and then those to add.
+    # Returns the first added product id that would go over the max, untouched
+    batch_script = """
+        if redis.call('EXISTS', KEYS[1]) == 0 then return nil end
+        local deleted = tonumber(ARGV[3])
+        local set = tonumber(ARGV[4])
+        for i = 5 + deleted + set * 2, #ARGV, 2 do
+            local current = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or 0)
+            if current + tonumber(ARGV[i + 1]) > tonumber(ARGV[2]) then return ARGV[i] end
+        end
+        for i = 5, 4 + deleted do
+            redis.call('HDEL', KEYS[1], ARGV[i])
+        end
+        for i = 5 + deleted, #ARGV, 2 do
+            if i < 5 + deleted + set * 2 then
+                redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+            else
+                redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+            end
+        end
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+        return 1
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+        self.redis = get_redis_connection('default')
+        self.ttl = settings.STORE_CART_TTL
+        self.increment = self.redis.register_script(self.increment_script)
+        self.set = self.redis.register_script(self.set_script)
+        self.batch = self.redis.register_script(self.batch_script)
+
+    def key(self, cart_id):
+        return f'store:cart:{cart_id}'
+
+    def build_items(self, cart, quantities):
+        products = Product.objects.in_bulk(list(quantities))
+        return [
+            CartItem(id = product_id, cart = cart, product = products[product_id], quantity = quantity)
+            for (product_id, quantity) in quantities.items() if product_id in products
+        ]
+
+    def build_cart(self, cart_id, values):
+        created_at = values.pop(self.created_field, None)
+        cart = Cart(id = cart_id, created_at = parse_datetime(created_at) if created_at else None)
+        quantities = {int(product_id): int(quantity) for (product_id, quantity) in values.items()}
+        # serve cart.items.all() from memory, as prefetch_related would
+        cart._prefetched_objects_cache = {'items': self.build_items(cart, quantities)}
+        return cart
+
+    def load(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None:
+            return (None, {})
+        values = {field.decode(): value.decode() for (field, value) in self.redis.hgetall(self.key(cart_id)).items()}
+        return (cart_id, values)
+
+    def create(self):
+        cart = Cart(id = uuid4(), created_at = timezone.now())
+        with self.redis.pipeline() as pipe:
+            pipe.hset(self.key(cart.id), self.created_field, cart.created_at.isoformat())
+            pipe.expire(self.key(cart.id), self.ttl)
+            pipe.execute()
+        cart._prefetched_objects_cache = {'items': []}
+        return cart
+
+    def exists(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        return cart_id is not None and self.redis.exists(self.key(cart_id)) > 0
+
+    def get(self, cart_id):
+        (cart_id, values) = self.load(cart_id)
+        if not values:
+            return None
+        return self.build_cart(cart_id, values)
+
+    def delete(self, cart_id):
+        cart_id = parse_cart_id(cart_id)
+        return cart_id is not None and self.redis.delete(self.key(cart_id)) > 0
+
+    def get_items(self, cart_id):
+        cart = self.get(cart_id)
+        return cart.items.all() if cart else []
+
+    def get_quantities(self, cart_id):
+        (_, values) = self.load(cart_id)
+        values.pop(self.created_field, None)
+        return {int(product_id): int(quantity) for (product_id, quantity) in values.items()}
+
+    def get_item(self, cart_id, item_id):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None or not str(item_id).isdigit():
+            return None
+        quantity = self.redis.hget(self.key(cart_id), item_id)
+        if quantity is None:
+            return None
+        items = self.build_items(Cart(id = cart_id), {int(item_id): int(quantity)})
+        return items[0] if items else None
+
+    def add_item(self, cart_id, product_id, quantity):
+        cart_id = parse_cart_id(cart_id)
+        if cart_id is None or not Product.objects.filter(pk = product_id).exists():
+            return None
+        quantity = self.increment(keys = [self.key(cart_id)], args = [product_id, quantity, self.ttl, CartItem.max_quantity])
+        if quantity is None:
+            raise Http404('No cart with given id was found')
+        return CartItem(id = product_id, cart_id = cart_id, product_id = product_id, quantity = quantity)
+
+    def set_quantity(self, item, quantity):
+        self.set(keys = [self.key(item.cart_id)], args = [item.product_id, quantity, self.ttl])
+        item.quantity = quantity
+        return item
+
+    def remove_item(self, item):
+        self.redis.hdel(self.key(item.cart_id), item.product_id)
+
+    def apply_batch(self, cart_id, added, quantities, deleted):
+        cart_id = parse_cart_id(cart_id)
+        args = [self.ttl, CartItem.max_quantity, len(deleted), len(quantities), *deleted]
+        for changes in (quantities, added):
+            for (product_id, quantity) in changes.items():
+                args += [product_id, quantity]
+        result = self.batch(keys = [self.key(cart_id)], args = args) if cart_id is not None else None
+        if result is None:
+            raise Http404('No cart with given id was found')
+        if isinstance(result, bytes):
+            raise quantity_overflow_error(int(result))
+        return self.get_items(cart_id)
@@ -0,0 +1,81 @@
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from time import monotonic
+from django.conf import settings
+from core.authentication import ClaimsUser
+from .models import Customer
+
+CustomerRef = namedtuple('CustomerRef', ['id', 'membership'])
+
+
+class CustomerCache:
+    """
+    Process-local LRU of user id -> CustomerRef. Entries expire after ttl
+    seconds, which bounds how long another process can serve a stale
+    membership; the process that saves a customer drops its entry at once.
+    """
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            (expires_at, ref) = entry
+            if expires_at < monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return ref
+
+    def set(self, user_id, ref):
+        with self.lock:
+            self.entries[user_id] = (monotonic() + self.ttl, ref)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last = False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+customer_cache = CustomerCache(settings.STORE_CUSTOMER_CACHE_SIZE, settings.STORE_CUSTOMER_CACHE_TTL)
+
+
+def resolve_customer(user_id, create = False):
+    ref = customer_cache.get(user_id)
+    if ref is not None:
+        return ref
+    row = Customer.objects.filter(user_id = user_id).values_list('id', 'membership').first()
+    if row is None:
+        if not create:
+            return None
+        (customer, _) = Customer.objects.get_or_create(user_id = user_id)
+        row = (customer.id, customer.membership)
+    ref = CustomerRef(*row)
+    customer_cache.set(user_id, ref)
+    return ref
+
+
+def get_customer(request, create = False):
+    # memoized on the underlying HttpRequest so every DRF Request wrapping it shares the lookup
+    http_request = getattr(request, '_request', request)
+    ref = getattr(http_request, 'customer_ref', None)
+    if ref is None:
+        user = request.user
+        if isinstance(user, ClaimsUser) and user.customer_id is not None and user.customer_membership is not None:
+            # current claims already name the customer, no lookup at all
+            ref = CustomerRef(user.customer_id, user.customer_membership)
+        else:
+            ref = resolve_customer(user.id, create = create)
+        http_request.customer_ref = ref
+    return ref
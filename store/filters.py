@@ -1,5 +1,5 @@
 from django_filters.rest_framework import FilterSet
-from .models import Product
+from .models import Product, ProductSummary
 
 class ProductFilter(FilterSet):
     class  Meta:
@@ -7,4 +7,12 @@ class ProductFilter(FilterSet):
         fields = {
             'collection_id': ['exact'],
             'unit_price': ['gt', 'lt']
-        }
\ No newline at end of file
+        }
+
+class ProductSummaryFilter(FilterSet):
+    class  Meta:
+        model = ProductSummary
+        fields = {
+            'collection_id': ['exact'],
+            'unit_price': ['gt', 'lt']
+        }
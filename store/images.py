@@ -0,0 +1,67 @@
+from io import BytesIO
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# name -> bounding box, every rendition is written in each of FORMATS
+RENDITIONS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
+FORMATS = {
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+RENDITIONS_DIR = 'store/renditions'
+
+
+def rendition_name(image_id, rendition, extension):
+    return f'{RENDITIONS_DIR}/{image_id}/{rendition}.{extension}'
+
+
+def flatten(image):
+    # JPEG has no alpha, transparent areas would come out black without a backdrop
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        image = Image.alpha_composite(background, image)
+    return image.convert('RGB')
+
+
+def build_renditions(product_image):
+    """
+    Writes every rendition of the original upload to the default storage and
+    returns {rendition: {extension: storage name}} for ProductImage.renditions.
+    """
+    largest = max(RENDITIONS.values())
+    with product_image.image.open('rb') as file:
+        original = Image.open(file)
+        # JPEGs are decoded at the smallest scale still covering the largest rendition
+        original.draft('RGB', largest)
+        original = flatten(ImageOps.exif_transpose(original))
+    renditions = {}
+    for (rendition, size) in RENDITIONS.items():
+        resized = original.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        renditions[rendition] = {}
+        for (extension, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            name = rendition_name(product_image.pk, rendition, extension)
+            # replace what an earlier run of the pipeline left behind
+            default_storage.delete(name)
+            renditions[rendition][extension] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return renditions
+
+
+def delete_renditions(renditions):
+    for formats in renditions.values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def rendition_urls(renditions):
+    return {
+        rendition: {extension: default_storage.url(name) for (extension, name) in formats.items()}
+        for (rendition, formats) in renditions.items()
+    }
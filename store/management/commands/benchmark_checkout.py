@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from random import Random
+from time import perf_counter
+from uuid import uuid4
+from store.carts import get_cart_store
+from store.models import Collection, Order, OrderItem, Product
+from store.serializers import CreateOrderSerializers
+
+
+class Command(BaseCommand):
+    help = 'Runs parallel checkouts against a few hot products and reports throughput and overselling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=3)
+        parser.add_argument('--inventory', type=int, default=100)
+        parser.add_argument('--checkouts', type=int, default=200)
+        parser.add_argument('--items', type=int, default=2, help='hot products per cart')
+        parser.add_argument('--threads', type=int, default=16)
+
+    def handle(self, *args, **options):
+        store = get_cart_store()
+        collection = Collection.objects.create(name='benchmark-checkout')
+        user = get_user_model().objects.create(username=f'benchmark-{uuid4()}', email=f'{uuid4()}@benchmark.local')
+        products = [
+            Product.objects.create(title=f'hot {n}', slug='hot', unit_price=10,
+                                   inventory=options['inventory'], collection=collection)
+            for n in range(options['products'])
+        ]
+        random = Random(0)
+        cart_ids = []
+        for _ in range(options['checkouts']):
+            cart = store.create()
+            for product in random.sample(products, min(options['items'], len(products))):
+                store.add_item(cart.id, product.pk, random.randint(1, 3))
+            cart_ids.append(cart.id)
+
+        def checkout(cart_id):
+            try:
+                serializer = CreateOrderSerializers(data={'cart_id': cart_id}, context={'user_id': user.id})
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return 'placed'
+            except DatabaseError as error:
+                return f'failed: {error.__class__.__name__}'
+            except Exception:
+                return 'rejected'
+            finally:
+                connection.close()
+
+        try:
+            start = perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                outcomes = list(executor.map(checkout, cart_ids))
+            elapsed = perf_counter() - start
+
+            sold = sum(OrderItem.objects.filter(product__in=products).values_list('quantity', flat=True))
+            remaining = sum(Product.objects.filter(pk__in=[p.pk for p in products]).values_list('inventory', flat=True))
+            print(f'{len(cart_ids)} checkouts on {len(products)} hot products with {options["threads"]} threads '
+                  f'in {elapsed:.2f}s ({len(cart_ids) / elapsed:.1f} checkouts/s)')
+            for outcome in sorted(set(outcomes)):
+                print(f'  {outcome}: {outcomes.count(outcome)}')
+            print(f'  sold {sold}, remaining {remaining}, stocked {options["inventory"] * len(products)}'
+                  f' -> {"consistent" if sold + remaining == options["inventory"] * len(products) and remaining >= 0 else "OVERSOLD"}')
+        finally:
+            for cart_id in cart_ids:
+                store.delete(cart_id)
+            OrderItem.objects.filter(product__in=products).delete()
+            Order.objects.filter(customer__user=user).delete()
+            Product.objects.filter(collection=collection).delete()
+            collection.delete()
+            user.delete()
@@ -0,0 +1,57 @@
+from PIL import Image
+from celery import group
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from io import BytesIO
+from random import Random
+from time import perf_counter
+from store.models import Collection, Product, ProductImage
+from store.tasks import process_product_image
+
+
+class Command(BaseCommand):
+    help = 'Uploads a batch of product images and measures how many images per second the pipeline renders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=50)
+        parser.add_argument('--width', type=int, default=3000)
+        parser.add_argument('--height', type=int, default=2000)
+        parser.add_argument('--queue', action='store_true',
+                            help='run through the celery workers instead of in this process')
+
+    def upload(self, random, width, height):
+        # noise doesn't compress, so the originals are as heavy as real photos
+        image = Image.frombytes('RGB', (width, height), random.randbytes(width * height * 3))
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        return ContentFile(buffer.getvalue(), name='benchmark.jpg')
+
+    def handle(self, *args, **options):
+        collection = Collection.objects.create(name='benchmark-images')
+        product = Product.objects.create(title='benchmark images', slug='benchmark', unit_price=10,
+                                         inventory=10, collection=collection)
+        random = Random(0)
+        upload = self.upload(random, options['width'], options['height'])
+        # bulk_create skips post_save, so nothing is queued before the timer starts
+        ProductImage.objects.bulk_create([ProductImage(product=product) for _ in range(options['images'])])
+        images = list(ProductImage.objects.filter(product=product))
+        for image in images:
+            upload.seek(0)
+            image.image.save(upload.name, upload, save=False)
+        ProductImage.objects.bulk_update(images, ['image'])
+        try:
+            start = perf_counter()
+            if options['queue']:
+                group(process_product_image.s(image.pk) for image in images)().get()
+            else:
+                for image in images:
+                    process_product_image(image.pk)
+            elapsed = perf_counter() - start
+            print(f'{len(images)} images of {options["width"]}x{options["height"]} in {elapsed:.2f}s '
+                  f'({len(images) / elapsed:.1f} images/s, {"celery workers" if options["queue"] else "in process"})')
+        finally:
+            for image in ProductImage.objects.filter(product=product):
+                image.image.delete(save=False)
+            # the images' post_delete removes their renditions
+            product.delete()
+            collection.delete()
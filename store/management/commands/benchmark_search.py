@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from random import Random
+from time import perf_counter
+from store.cache import invalidate_products
+from store.models import Collection, Product, ProductSummary
+from store.search import ProductSearchFilter
+
+WORDS = ['cotton', 'linen', 'wool', 'silk', 'shirt', 'hat', 'scarf', 'jacket', 'coat', 'boots',
+         'sandals', 'belt', 'red', 'blue', 'green', 'black', 'white', 'summer', 'winter', 'classic',
+         'slim', 'regular', 'oversized', 'vintage', 'organic', 'leather', 'denim', 'striped', 'plain', 'knit']
+# a long tail of rare words so the queries below range from broad to selective
+RARE_WORDS = [f'{word}{number}' for word in WORDS for number in range(100)]
+
+
+class SearchView:
+    search_fields = ['title', 'description']
+
+
+class Command(BaseCommand):
+    help = 'Compares the LIKE based SearchFilter with the full-text product search across catalog sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--queries', nargs='+', default=['shirt', 'red wool', 'denim42', 'silk7 coat'])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # rows are committed because InnoDB only indexes FULLTEXT columns on commit,
+        # everything created here is removed again at the end
+        collection = Collection.objects.create(name='benchmark-search')
+        random = Random(0)
+        try:
+            for size in sorted(options['sizes']):
+                self.fill(collection, size, random)
+                self.report(size, options['queries'], options['repeat'])
+        finally:
+            ProductSummary.objects.filter(collection=collection).delete()
+            Product.objects.filter(collection=collection).delete()
+            collection.delete()
+            invalidate_products([], [])
+
+    def fill(self, collection, size, random):
+        created = Product.objects.filter(collection=collection).count()
+        now = timezone.now()
+        while created < size:
+            batch = min(1000, size - created)
+            products = Product.objects.bulk_create([
+                Product(
+                    title=' '.join(random.sample(WORDS, 3)),
+                    slug='benchmark-search',
+                    description=' '.join(random.choices(WORDS, k=10) + random.choices(RARE_WORDS, k=10)),
+                    unit_price=10,
+                    inventory=10,
+                    collection=collection
+                ) for _ in range(batch)
+            ])
+            if products[0].pk is None:
+                products = Product.objects.filter(collection=collection).order_by('-pk')[:batch]
+            ProductSummary.objects.bulk_create([
+                ProductSummary(
+                    product=product,
+                    title=product.title,
+                    slug=product.slug,
+                    description=product.description,
+                    unit_price=product.unit_price,
+                    price_with_tax=11,
+                    inventory=product.inventory,
+                    last_update=now,
+                    collection=collection,
+                    collection_name=collection.name
+                ) for product in products
+            ])
+            created += batch
+        invalidate_products([], [collection.id])
+
+    def first_page(self, search_filter, request, view):
+        # what the list endpoint runs: the paginator's COUNT plus the first page
+        queryset = search_filter.filter_queryset(request, ProductSummary.objects.all(), view)
+        queryset.count()
+        return list(queryset[:10])
+
+    def report(self, size, queries, repeat):
+        factory = APIRequestFactory()
+        view = SearchView()
+        for query in queries:
+            request = Request(factory.get('/store/products/', {'search': query}))
+            timings = []
+            for search_filter in [SearchFilter(), ProductSearchFilter()]:
+                # first run warms the in-process index when that backend is used
+                self.first_page(search_filter, request, view)
+                start = perf_counter()
+                for _ in range(repeat):
+                    self.first_page(search_filter, request, view)
+                timings.append((perf_counter() - start) / repeat * 1000)
+            print(f'{size:>8} products  {query!r:<16} SearchFilter {timings[0]:8.2f}ms  '
+                  f'full-text {timings[1]:8.2f}ms  ({timings[0] / timings[1]:.1f}x)')
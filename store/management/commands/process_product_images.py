@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from store.models import ProductImage
+from store.tasks import process_product_image
+
+
+class Command(BaseCommand):
+    help = 'Generates the renditions of product images that have none yet'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='reprocess every image')
+        parser.add_argument('--queue', action='store_true', help='hand the images to the celery workers')
+    
+    def handle(self, *args, **options):
+        images = ProductImage.objects.all() if options['all'] else ProductImage.objects.filter(renditions={})
+        image_ids = list(images.values_list('pk', flat=True))
+        for image_id in image_ids:
+            if options['queue']:
+                process_product_image.delay(image_id)
+            else:
+                process_product_image(image_id)
+        print(f'{len(image_ids)} product images {"queued" if options["queue"] else "processed"}.')
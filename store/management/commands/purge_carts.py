@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from store.tasks import purge_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Deletes carts older than STORE_CART_MAX_AGE in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int)
+        parser.add_argument('--batch-size', type=int)
+    
+    def handle(self, *args, **options):
+        max_age = options['max_age_days'] * 24 * 60 * 60 if options['max_age_days'] else None
+        purged = purge_abandoned_carts(max_age=max_age, batch_size=options['batch_size'])
+        print(f"{purged['carts']} carts and {purged['items']} cart items purged in {purged['seconds']}s.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from store.projection import rebuild_product_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized product read model in bulk'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        print('Rebuilding product summaries...')
+        rebuilt = rebuild_product_summaries(batch_size=options['batch_size'])
+        print(f'{rebuilt} product summaries rebuilt.')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Collection.products_count from the products table and fixes any drift'
+    
+    def handle(self, *args, **options):
+        fixed = Collection.objects.reconcile_products_count()
+        print(f'{fixed} collection counts fixed.')
@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from django.db import connection
 from pathlib import Path
 import os
+from store.models import Collection
+from store.projection import rebuild_product_summaries
 
 
 class Command(BaseCommand):
@@ -14,4 +16,7 @@ class Command(BaseCommand):
         sql = Path(file_path).read_text()
         
         with connection.cursor() as cursor:
-            cursor.execute(sql)
\ No newline at end of file
+            cursor.execute(sql)
+        # the raw inserts skip the signals that maintain the counters and the summaries
+        Collection.objects.reconcile_products_count()
+        rebuild_product_summaries()
\ No newline at end of file
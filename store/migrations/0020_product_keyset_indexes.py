@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # it used to carry the productimage.image drift too, which moved to 0028
+    replaces = [
+        ('store', '0020_alter_productimage_image_and_more'),
+    ]
+
+    dependencies = [
+        ('store', '0019_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['unit_price', 'id'], name='store_produ_unit_pr_2ca2a1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['last_update', 'id'], name='store_produ_last_up_34dd1f_idx'),
+        ),
+    ]
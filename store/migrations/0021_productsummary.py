@@ -0,0 +1,61 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:17
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def populate_product_summaries(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductSummary = apps.get_model('store', 'ProductSummary')
+    products = Product.objects.select_related('collection').prefetch_related('image')
+    # built and written a chunk at a time, the catalog never has to fit in memory
+    summaries = []
+    for product in products.iterator(chunk_size=500):
+        summaries.append(ProductSummary(
+            product_id=product.id,
+            title=product.title,
+            slug=product.slug,
+            description=product.description,
+            unit_price=product.unit_price,
+            price_with_tax=(product.unit_price * Decimal('1.1')).quantize(Decimal('0.01')),
+            inventory=product.inventory,
+            last_update=product.last_update,
+            collection_id=product.collection_id,
+            collection_name=product.collection.name,
+            images=[{'id': image.id, 'url': image.image.url} for image in sorted(product.image.all(), key=lambda image: image.id)],
+        ))
+        if len(summaries) == 500:
+            ProductSummary.objects.bulk_create(summaries)
+            summaries = []
+    ProductSummary.objects.bulk_create(summaries)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSummary',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='store.product')),
+                ('title', models.CharField(max_length=250)),
+                ('slug', models.SlugField()),
+                ('description', models.TextField(blank=True, null=True)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('price_with_tax', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('inventory', models.IntegerField()),
+                ('last_update', models.DateTimeField()),
+                ('collection_name', models.CharField(max_length=255)),
+                ('images', models.JSONField(default=list)),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='store.collection')),
+            ],
+            options={
+                'ordering': ['title'],
+                'indexes': [models.Index(fields=['unit_price', 'product'], name='store_produ_unit_pr_7a6d62_idx'), models.Index(fields=['last_update', 'product'], name='store_produ_last_up_f4076c_idx')],
+            },
+        ),
+        migrations.RunPython(populate_product_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX store_productsummary_search ON store_productsummary (title, description)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX store_productsummary_search ON store_productsummary')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_productsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
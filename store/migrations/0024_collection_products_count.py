@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_products_count(apps, schema_editor):
+    Collection = apps.get_model('store', 'Collection')
+    Product = apps.get_model('store', 'Product')
+    counts = Product.objects.filter(collection=OuterRef('pk')).order_by().values('collection').annotate(count=Count('pk')).values('count')
+    Collection.objects.update(products_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_alter_cart_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collection',
+            name='products_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_products_count, migrations.RunPython.noop),
+    ]
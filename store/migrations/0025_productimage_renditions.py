@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+def drop_original_urls(apps, schema_editor):
+    # summaries list renditions instead of the original upload, which are empty
+    # until process_product_images has run over the existing images
+    ProductSummary = apps.get_model('store', 'ProductSummary')
+    for summary in ProductSummary.objects.exclude(images=[]).iterator(chunk_size=500):
+        summary.images = [{'id': image['id'], 'renditions': {}} for image in summary.images]
+        summary.save(update_fields=['images'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0024_collection_products_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(drop_original_urls, migrations.RunPython.noop),
+    ]
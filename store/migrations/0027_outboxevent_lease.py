@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0026_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='available_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='dead_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['dead_at', 'available_at'], name='store_outbo_dead_at_f0894b_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:26
+
+import django.core.validators
+import store.validator
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0027_outboxevent_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(upload_to='store/media', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'png']), store.validator.validate_image_size]),
+        ),
+    ]
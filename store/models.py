@@ -1,7 +1,9 @@
 from django.core.validators import MinValueValidator, FileExtensionValidator
 from django.conf import settings
 from django.contrib  import admin
-from django.db import models
+from django.db import connection, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from uuid import uuid4
 from .validator import validate_image_size
 
@@ -9,7 +11,36 @@ class Promotion(models.Model):
     description = models.CharField(max_length = 255)
     discount = models.FloatField()
 
+class InsufficientInventory(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f'Not enough inventory for products {product_ids}')
+
+class ProductManager(models.Manager):
+    
+    def reserve(self, quantities):
+        """
+        Decrements the inventory of {product_id: quantity} or raises
+        InsufficientInventory without touching any of it. The rows are locked
+        in primary key order, so concurrent checkouts can't deadlock on each
+        other, and updated with a single UPDATE. Must run in a transaction.
+        """
+        product_ids = sorted(quantities)
+        products = list(self.select_for_update().filter(pk__in = product_ids).order_by('pk'))
+        found_ids = {product.pk for product in products}
+        short_ids = [pk for pk in product_ids if pk not in found_ids]
+        short_ids += [product.pk for product in products if product.inventory < quantities[product.pk]]
+        if short_ids:
+            raise InsufficientInventory(sorted(short_ids))
+        self.filter(pk__in = product_ids).update(inventory = models.Case(
+            *[models.When(pk = pk, then = models.F('inventory') - quantity) for (pk, quantity) in quantities.items()],
+            default = models.F('inventory')))
+        for product in products:
+            product.inventory -= quantities[product.pk]
+        return products
+
 class Product(models.Model):
+    objects = ProductManager()
     id = models.BigAutoField(primary_key=True)
     title = models.CharField(max_length=250)
     slug = models.SlugField()
@@ -28,15 +59,63 @@ class Product(models.Model):
     
     class Meta:
         ordering = ['title']
+        indexes = [
+            # keyset pagination seeks on (ordering field, id)
+            models.Index(fields = ['unit_price', 'id']),
+            models.Index(fields = ['last_update', 'id']),
+        ]
         
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete= models.CASCADE, related_name = 'image')
     image = models.ImageField(upload_to= 'store/media',
                               validators= [FileExtensionValidator(allowed_extensions= ['jpg', 'png']), validate_image_size] )
+    # {rendition: {extension: storage name}}, filled in by store.tasks.process_product_image
+    renditions = models.JSONField(default = dict, blank = True)
+
+class ProductSummary(models.Model):
+    # read model for the product endpoints, kept in sync by store.projection
+    product = models.OneToOneField(Product, on_delete = models.CASCADE, primary_key = True, related_name = 'summary')
+    title = models.CharField(max_length = 250)
+    slug = models.SlugField()
+    description = models.TextField(null = True, blank = True)
+    unit_price = models.DecimalField(max_digits = 5, decimal_places = 2)
+    price_with_tax = models.DecimalField(max_digits = 7, decimal_places = 2)
+    inventory = models.IntegerField()
+    last_update = models.DateTimeField()
+    collection = models.ForeignKey('Collection', on_delete = models.CASCADE, related_name = '+')
+    collection_name = models.CharField(max_length = 255)
+    images = models.JSONField(default = list)
+    
+    def __str__(self) -> str:
+        return self.title
+    
+    class Meta:
+        ordering = ['title']
+        indexes = [
+            models.Index(fields = ['unit_price', 'product']),
+            models.Index(fields = ['last_update', 'product']),
+        ]
+
+class CollectionManager(models.Manager):
+    
+    def add_products_count(self, collection_id, delta):
+        # a single UPDATE ... SET products_count = products_count + delta, safe under concurrent writers
+        self.filter(pk = collection_id).update(products_count = models.F('products_count') + delta)
+    
+    def reconcile_products_count(self):
+        """Resets every drifted products_count with one UPDATE, returns how many were off."""
+        counts = Product.objects.filter(collection = models.OuterRef('pk'))\
+            .order_by().values('collection').annotate(count = models.Count('pk')).values('count')
+        actual = Coalesce(models.Subquery(counts), 0)
+        return self.exclude(products_count = actual).update(products_count = actual)
 
 class Collection(models.Model):
     name = models.CharField(max_length = 255)
     featured_product = models.ForeignKey(Product, on_delete = models.SET_NULL, null = True, related_name = '+' )
+    # kept up to date by the Product signal handlers, see reconcile_collection_counts
+    products_count = models.IntegerField(default = 0)
+    
+    objects = CollectionManager()
     
     def __str__(self) -> str:
         return self.name
@@ -94,6 +173,25 @@ class Order(models.Model):
             ('can_cancel', 'Can cancel order')
         ]
     
+class OutboxEvent(models.Model):
+    # written in the transaction that produces the event, delivered by store.tasks.relay_outbox
+    topic = models.CharField(max_length = 50)
+    payload = models.JSONField(default = dict)
+    created_at = models.DateTimeField(auto_now_add = True)
+    attempts = models.PositiveIntegerField(default = 0)
+    # a relay claims an event by pushing this past its lease, so it isn't held locked during delivery
+    available_at = models.DateTimeField(default = timezone.now)
+    # set once STORE_OUTBOX_MAX_ATTEMPTS deliveries failed, the relay leaves it alone from then on
+    dead_at = models.DateTimeField(null = True, blank = True)
+    
+    def __str__(self) -> str:
+        return f'{self.topic} {self.payload}'
+    
+    class Meta:
+        indexes = [
+            models.Index(fields = ['dead_at', 'available_at']),
+        ]
+    
 class Address(models.Model):
     zip =zip()
     street = models.CharField(max_length = 255)
@@ -110,9 +208,36 @@ class OrderItem(models.Model):
 
 class Cart(models.Model):
     id = models.UUIDField(primary_key= True, default= uuid4)
-    created_at = models.DateTimeField(auto_now_add = True)
+    created_at = models.DateTimeField(auto_now_add = True, db_index = True)
+
+class CartItemManager(models.Manager):
+    
+    def add_product(self, cart_id, product_id, quantity):
+        """
+        Inserts the item or increments its quantity in a single statement,
+        capped at CartItem.max_quantity. The row is selected from
+        store_product, so nothing is written and False is returned when the
+        product doesn't exist.
+        """
+        cart_id = Cart._meta.pk.get_db_prep_value(Cart._meta.pk.to_python(cart_id), connection)
+        table = self.model._meta.db_table
+        product_table = Product._meta.db_table
+        insert = f'INSERT INTO {table} (cart_id, product_id, quantity) ' \
+                 f'SELECT %s, id, %s FROM {product_table} WHERE id = %s '
+        # SQLite's two argument MIN() is LEAST() elsewhere
+        least = 'MIN' if connection.vendor == 'sqlite' else 'LEAST'
+        if connection.vendor == 'mysql':
+            upsert = f'ON DUPLICATE KEY UPDATE quantity = {least}(quantity + %s, %s)'
+        else:
+            upsert = f'ON CONFLICT (product_id, cart_id) DO UPDATE SET quantity = {least}({table}.quantity + %s, %s)'
+        with connection.cursor() as cursor:
+            cursor.execute(insert + upsert, [cart_id, quantity, product_id, quantity, self.model.max_quantity])
+            return cursor.rowcount > 0
 
 class CartItem(models.Model):
+    # the largest value the PositiveSmallIntegerField holds on every backend
+    max_quantity = 32767
+    objects = CartItemManager()
     cart = models.ForeignKey(Cart, on_delete = models.CASCADE, related_name = 'items')
     product = models.ForeignKey(Product, on_delete = models.CASCADE)
     quantity = models.PositiveSmallIntegerField(
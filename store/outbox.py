@@ -0,0 +1,26 @@
+from django.db import transaction
+from .models import Order, OutboxEvent
+from .signals.signal import order_created
+
+
+def load_orders(payloads):
+    orders = Order.objects.in_bulk([payload['order_id'] for payload in payloads])
+    return [{'order': orders[payload['order_id']]} if payload['order_id'] in orders else None for payload in payloads]
+
+
+# topic -> (signal, loader turning a batch of payloads into the signal's kwargs, None when the subject is gone)
+TOPICS = {
+    'order_created': (order_created, load_orders),
+}
+
+
+def publish(topic, **payload):
+    """
+    Records the event in the current transaction, so receivers only hear about
+    what was committed. Delivery is at least once: receivers may see an event again.
+    """
+    from .tasks import relay_outbox
+    event = OutboxEvent.objects.create(topic = topic, payload = payload)
+    # only a nudge, the periodic relay delivers the event anyway when the broker is down
+    transaction.on_commit(relay_outbox.delay, robust = True)
+    return event
@@ -1,4 +1,105 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # seeks past the last row of the previous page with `WHERE (field, pk) > (value, pk)`
+    # so deep pages cost the same as the first one and no COUNT(*) is issued
+    page_size = 10
+    cursor_query_param = 'cursor'
+    ordering_param = 'ordering'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        (field, descending) = self.get_ordering(request, view)
+        keys = [field, 'pk'] if field != 'pk' else ['pk']
+        queryset = queryset.order_by(*[f'-{key}' if descending else key for key in keys])
+
+        cursor = self.decode_cursor(request, queryset.model, field, descending)
+        if cursor is not None:
+            (value, pk) = cursor
+            lookup = 'lt' if descending else 'gt'
+            seek = Q(**{f'pk__{lookup}': pk})
+            if field != 'pk':
+                seek = Q(**{f'{field}__{lookup}': value}) | (Q(**{field: value}) & seek)
+            queryset = queryset.filter(seek)
+
+        results = list(queryset[:self.page_size + 1])
+        self.next_cursor = None
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            self.next_cursor = self.encode_cursor(results[-1], field, descending)
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_ordering(self, request, view):
+        ordering = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        field = ordering.lstrip('-')
+        if field in getattr(view, 'ordering_fields', []):
+            return (field, ordering.startswith('-'))
+        return ('pk', False)
+
+    def encode_cursor(self, instance, field, descending):
+        payload = {
+            'o': f'-{field}' if descending else field,
+            'v': str(getattr(instance, field)),
+            'pk': instance.pk
+        }
+        return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def decode_cursor(self, request, model, field, descending):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()))
+            if payload['o'] != (f'-{field}' if descending else field):
+                raise ValueError
+            pk = model._meta.pk.to_python(payload['pk'])
+            value = pk if field == 'pk' else model._meta.get_field(field).to_python(payload['v'])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk)
+
 
 class DefaultPagination(PageNumberPagination):
-    page_size = 10
\ No newline at end of file
+    page_size = 10
+    mode_query_param = 'pagination'
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if request.query_params.get(self.mode_query_param) == 'cursor' \
+                or self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_pagination_class()
+            if self.page_size:
+                self.keyset.page_size = self.page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class OrderPagination(DefaultPagination):
+    # orders have always been returned unpaginated, only ?pagination=cursor pages them
+    page_size = None
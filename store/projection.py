@@ -0,0 +1,76 @@
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Prefetch
+from .images import rendition_urls
+from .models import Product, ProductImage, ProductSummary
+
+TAX_RATE = Decimal('1.1')
+
+SUMMARY_FIELDS = ['title', 'slug', 'description', 'unit_price', 'price_with_tax', 'inventory',
+                  'last_update', 'collection', 'collection_name', 'images']
+
+
+def price_with_tax(unit_price):
+    return (unit_price * TAX_RATE).quantize(Decimal('0.01'))
+
+
+def image_entry(image: ProductImage):
+    # only the processed renditions, the original upload is never served to clients
+    return {'id': image.id, 'renditions': rendition_urls(image.renditions)}
+
+
+def build_summary(product: Product):
+    return ProductSummary(
+        product = product,
+        title = product.title,
+        slug = product.slug,
+        description = product.description,
+        unit_price = product.unit_price,
+        price_with_tax = price_with_tax(product.unit_price),
+        inventory = product.inventory,
+        last_update = product.last_update,
+        collection_id = product.collection_id,
+        collection_name = product.collection.name,
+        images = [image_entry(image) for image in product.image.all()]
+    )
+
+
+def refresh_product_summaries(product_ids):
+    products = Product.objects.filter(pk__in = list(product_ids))\
+        .select_related('collection')\
+        .prefetch_related(Prefetch('image', queryset = ProductImage.objects.order_by('id')))
+    summaries = [build_summary(product) for product in products]
+    if not summaries:
+        return 0
+    # MySQL upserts on any unique key and doesn't accept an explicit conflict target
+    unique_fields = ['product'] if connection.features.supports_update_conflicts_with_target else None
+    ProductSummary.objects.bulk_create(
+        summaries,
+        update_conflicts = True,
+        unique_fields = unique_fields,
+        update_fields = SUMMARY_FIELDS)
+    return len(summaries)
+
+
+def refresh_product_images(product_id):
+    # update only: when a product is deleted its images go after its summary,
+    # and re-inserting the summary there would break the product delete
+    images = [image_entry(image) for image in ProductImage.objects.filter(product_id = product_id).order_by('id')]
+    ProductSummary.objects.filter(pk = product_id).update(images = images)
+
+
+def refresh_collection_name(collection):
+    ProductSummary.objects.filter(collection_id = collection.pk).update(collection_name = collection.name)
+
+
+def rebuild_product_summaries(batch_size = 500):
+    rebuilt = 0
+    last_id = 0
+    while True:
+        product_ids = list(Product.objects.filter(pk__gt = last_id)
+                           .order_by('pk')
+                           .values_list('pk', flat = True)[:batch_size])
+        if not product_ids:
+            return rebuilt
+        rebuilt += refresh_product_summaries(product_ids)
+        last_id = product_ids[-1]
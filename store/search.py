@@ -0,0 +1,129 @@
+import math
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from functools import lru_cache
+from threading import Lock
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework.filters import SearchFilter
+from .cache import CATALOG_VERSION_KEY, get_version
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+class MySQLFullTextSearch:
+    """Boolean mode MATCH ... AGAINST over a FULLTEXT index, every term is a required prefix."""
+    def search(self, queryset, fields, terms):
+        opts = queryset.model._meta
+        columns = ', '.join(f'`{opts.db_table}`.`{opts.get_field(field).column}`' for field in fields)
+        match = f'MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)'
+        against = ' '.join(f'+{term}*' for term in terms)
+        return queryset\
+            .filter(RawSQL(match, [against], output_field = BooleanField()))\
+            .annotate(search_rank = RawSQL(match, [against], output_field = FloatField()))\
+            .order_by('-search_rank')
+
+
+class InvertedIndex:
+    def __init__(self, rows):
+        postings = defaultdict(Counter)
+        for (pk, *values) in rows:
+            for value in values:
+                for token in tokenize(value):
+                    postings[token][pk] += 1
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        self.size = len({pk for counts in self.postings.values() for pk in counts})
+
+    def prefixed(self, term):
+        start = bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            yield token
+
+    def search(self, terms):
+        """Returns {pk: tf-idf score} of the rows matching a prefix of every term."""
+        scores = None
+        for term in terms:
+            term_scores = Counter()
+            for token in self.prefixed(term):
+                counts = self.postings[token]
+                idf = math.log(1 + self.size / len(counts))
+                for (pk, frequency) in counts.items():
+                    term_scores[pk] += frequency * idf
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = Counter({pk: score + term_scores[pk] for (pk, score) in scores.items() if pk in term_scores})
+            if not scores:
+                break
+        return scores or {}
+
+
+class InvertedIndexSearch:
+    """
+    In-process fallback for databases without a FULLTEXT index (dev and tests).
+    The index covers the whole table and is rebuilt when the catalog version moves.
+    """
+    # only the best matches get an explicit rank, the rest follow in pk order
+    ranked_limit = 100
+    # matches beyond these are dropped, every one is a parameter of the IN list
+    # and SQLite may allow as few as 999 of them per query
+    candidate_limit = 500
+
+    def __init__(self):
+        self.indexes = {}
+        self.lock = Lock()
+
+    def get_index(self, model, fields):
+        key = (model._meta.label, tuple(fields))
+        version = get_version(CATALOG_VERSION_KEY)
+        (index_version, index) = self.indexes.get(key, (None, None))
+        if index_version != version:
+            with self.lock:
+                rows = model._default_manager.values_list('pk', *fields).iterator()
+                index = InvertedIndex(rows)
+                self.indexes[key] = (version, index)
+        return index
+
+    def search(self, queryset, fields, terms):
+        scores = self.get_index(queryset.model, fields).search(terms)
+        if not scores:
+            return queryset.none()
+        candidates = sorted(scores, key = scores.get, reverse = True)[:self.candidate_limit]
+        rank = Case(
+            *[When(pk = pk, then = Value(scores[pk])) for pk in candidates[:self.ranked_limit]],
+            default = Value(0.0),
+            output_field = FloatField())
+        return queryset.filter(pk__in = candidates)\
+            .annotate(search_rank = rank)\
+            .order_by('-search_rank', 'pk')
+
+
+@lru_cache(maxsize = None)
+def get_search_backend():
+    backend = getattr(settings, 'STORE_SEARCH_BACKEND', None)
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == 'mysql':
+        return MySQLFullTextSearch()
+    return InvertedIndexSearch()
+
+
+class ProductSearchFilter(SearchFilter):
+    """SearchFilter with the same ?search= parameter, backed by a ranked full-text backend."""
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = [token for term in self.get_search_terms(request) for token in tokenize(term)]
+        if not search_fields or not terms:
+            return queryset
+        return get_search_backend().search(queryset, search_fields, terms)
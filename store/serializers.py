@@ -1,32 +1,126 @@
 from rest_framework import serializers
-from .models import Product, Collection, Reviews, Cart, CartItem, Customer, Order, OrderItem, ProductImage
-from decimal import Decimal
-from django.db import transaction
-from .signals.signal import order_created
+from .models import Product, Collection, Reviews, Cart, CartItem, Customer, Order, OrderItem, ProductImage, ProductSummary,\
+                    InsufficientInventory
+from django.db import models, transaction
+from likes.models import LikedItem
+from tags.models import TaggedItem
+from .signals.signal import products_updated
+from .outbox import publish
+from .projection import price_with_tax
+from .images import rendition_urls
+from .carts import get_cart_store
+from .customers import resolve_customer
+
+def absolute_renditions(urls, request):
+    if request is None:
+        return urls
+    return {rendition: {extension: request.build_absolute_uri(url) for (extension, url) in formats.items()}
+            for (rendition, formats) in urls.items()}
 
 class CollectionSerializers(serializers.ModelSerializer):
     class Meta:
         model = Collection
         fields = ['id', 'name', 'products_count']
-    products_count = serializers.IntegerField(read_only=True)
+        read_only_fields = ['products_count']
 
 class ProductImageSerializers(serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+    
     def  create(self, validated_data):
         product_id = self.context['product_id']
         return ProductImage.objects.create(product_id = product_id, **validated_data)
+    
+    def validate_image(self, image):
+        # streamed straight to its storage name, save the name rather than copying the file again
+        return getattr(image, 'storage_name', image)
+    
+    def get_renditions(self, image: ProductImage):
+        return absolute_renditions(rendition_urls(image.renditions), self.context.get('request'))
     class Meta:
         model = ProductImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'renditions']
+        # clients get the resized renditions, empty until the worker has processed the upload
+        extra_kwargs = {'image': {'write_only': True}}
 
-class ProductSerializers(serializers.ModelSerializer):
+class ProductRelationsMixin:
+    """
+    Optional ?include=tags,likes_count fields, loaded for a whole page at once
+    through the batched tags and likes managers.
+    """
+    optional_fields = ['tags', 'likes_count']
+    
+    def get_includes(self):
+        request = self.context.get('request')
+        if request is None:
+            return []
+        requested = request.query_params.get('include', '').split(',')
+        return [field for field in self.optional_fields if field in requested]
+    
+    def load_relations(self, product_ids):
+        # kept in the root's context so the list and its children share one load
+        relations = self.context.setdefault('product_relations', {})
+        includes = self.get_includes()
+        product_ids = [pk for pk in product_ids if pk not in relations]
+        if not includes or not product_ids:
+            return relations
+        tags = TaggedItem.objects.get_tags_for_many(Product, product_ids) if 'tags' in includes else {}
+        likes = LikedItem.objects.count_for_many(Product, product_ids) if 'likes_count' in includes else {}
+        for pk in product_ids:
+            relations[pk] = {}
+            if 'tags' in includes:
+                relations[pk]['tags'] = [{'id': tag.id, 'label': tag.label} for tag in tags.get(pk, [])]
+            if 'likes_count' in includes:
+                relations[pk]['likes_count'] = likes.get(pk, 0)
+        return relations
+    
+    def add_relations(self, data, product_id):
+        if self.get_includes():
+            data.update(self.load_relations([product_id])[product_id])
+        return data
+
+class ProductListSerializers(serializers.ListSerializer):
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.load_relations([product.pk for product in products])
+        return super().to_representation(products)
+
+class ProductSerializers(ProductRelationsMixin, serializers.ModelSerializer):
     image = ProductImageSerializers(many = True, read_only = True)
     class Meta:
         model = Product
         fields = ['id', 'title', 'slug', 'description', 'unit_price', 'inventory', 'collection', 'price_with_tax', 'image']
+        list_serializer_class = ProductListSerializers
     price_with_tax = serializers.SerializerMethodField(method_name= 'tax_calculator')
     
     def tax_calculator(self, product: Product):
-        return product.unit_price * Decimal(1.1)
+        return price_with_tax(product.unit_price)
+    
+    def to_representation(self, product: Product):
+        return self.add_relations(super().to_representation(product), product.pk)
+
+class ProductSummarySerializers(ProductRelationsMixin, serializers.BaseSerializer):
+    """Read-only dump of a ProductSummary in the same shape as ProductSerializers."""
+    class Meta:
+        list_serializer_class = ProductListSerializers
+    
+    def to_representation(self, summary: ProductSummary):
+        request = self.context.get('request')
+        return self.add_relations({
+            'id': summary.product_id,
+            'title': summary.title,
+            'slug': summary.slug,
+            'description': summary.description,
+            'unit_price': summary.unit_price,
+            'inventory': summary.inventory,
+            'collection': summary.collection_id,
+            'price_with_tax': summary.price_with_tax,
+            'image': [
+                {
+                    'id': image['id'],
+                    'renditions': absolute_renditions(image['renditions'], request)
+                } for image in summary.images
+            ]
+        }, summary.product_id)
     
 class ReviewsSerilizer(serializers.ModelSerializer):
     class Meta:
@@ -72,29 +166,49 @@ class CartSerializers(serializers.ModelSerializer):
 class AddCartItemSerializers(serializers.ModelSerializer):
     product_id =serializers.IntegerField()
     
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk = value).exists():
-            raise serializers.ValidationError('No product does exist with given id was found.')
-        return value
-    
     def save(self, **kwargs):
         cart_id = self.context['cart_id']
         product_id = self.validated_data['product_id']
         quantity = self.validated_data['quantity']
-        try:
-            cart_item = CartItem.objects.get(product_id = product_id, cart_id= cart_id)
-            cart_item.quantity += quantity 
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(cart_id = cart_id , **self.validated_data)
+        self.instance = get_cart_store().add_item(cart_id, product_id, quantity)
+        if self.instance is None:
+            raise serializers.ValidationError({'product_id': ['No product does exist with given id was found.']})
         return self.instance
 
     class Meta:
         model = CartItem
         fields = ['id', 'product_id', 'quantity'] 
         
+class CartItemChangeSerializers(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value= 1, max_value= CartItem.max_quantity)
+
+class BatchCartItemSerializers(serializers.Serializer):
+    add = CartItemChangeSerializers(many= True, required= False)
+    update = CartItemChangeSerializers(many= True, required= False)
+    delete = serializers.ListField(child= serializers.IntegerField(), required= False)
+    
+    def validate(self, data):
+        product_ids = [item['product_id'] for item in data.get('add', []) + data.get('update', [])]
+        product_ids += data.get('delete', [])
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError('Each product can appear only once in a batch.')
+        existing_ids = set(Product.objects.filter(pk__in = product_ids).values_list('pk', flat= True))
+        missing_ids = sorted(set(product_ids) - existing_ids)
+        if missing_ids:
+            raise serializers.ValidationError({'product_id': [f'No product does exist with id {pk}.' for pk in missing_ids]})
+        return data
+    
+    def save(self, **kwargs):
+        added = {item['product_id']: item['quantity'] for item in self.validated_data.get('add', [])}
+        quantities = {item['product_id']: item['quantity'] for item in self.validated_data.get('update', [])}
+        deleted = self.validated_data.get('delete', [])
+        return get_cart_store().apply_batch(self.context['cart_id'], added, quantities, deleted)
+
 class UpdateCartItemSerializers(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        return get_cart_store().set_quantity(instance, validated_data['quantity'])
+    
     class Meta:
         model = CartItem
         fields = ['quantity']
@@ -126,30 +240,49 @@ class CreateOrderSerializers(serializers.Serializer):
     cart_id = serializers.UUIDField()
     
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk = cart_id).exists():
-            raise serializers.ValidationError('No cart with given id was found')
-        if CartItem.objects.filter(cart_id = cart_id).count() == 0:
+        # the same read feeds the order, the extra lookup only runs on the error path
+        self.quantities = get_cart_store().get_quantities(cart_id)
+        if not self.quantities:
+            if not get_cart_store().exists(cart_id):
+                raise serializers.ValidationError('No cart with given id was found')
             raise serializers.ValidationError('Cart is empty')
         return cart_id    
     def save(self, **kwargs):
         with transaction.atomic():
-            (customer, created) = Customer.objects.get_or_create(user_id = self.context['user_id'])
-            order = Order.objects.create(customer = customer)
+            quantities = self.quantities
+            try:
+                products = {product.pk: product for product in Product.objects.reserve(quantities)}
+            except InsufficientInventory as error:
+                raise serializers.ValidationError(
+                    {'cart_id': [f'Not enough inventory for product {pk}.' for pk in error.product_ids]})
+            
+            customer_id = self.context.get('customer_id') or resolve_customer(self.context['user_id'], create = True).id
+            order = Order.objects.create(customer_id = customer_id)
             
-            cart_items = CartItem.objects.select_related('product').filter(cart_id = self._validated_data['cart_id'])
             order_items = [
                 OrderItem(
                     order = order,
-                    product = item.product,
-                    quantity = item.quantity,
-                    unit_price = item.product.unit_price,
-                ) for item in cart_items
+                    product = products[product_id],
+                    quantity = quantity,
+                    unit_price = products[product_id].unit_price,
+                ) for (product_id, quantity) in quantities.items()
             ]
             OrderItem.objects.bulk_create(order_items)
+            if order_items[0].pk is None:
+                # MySQL doesn't return the ids of a bulk insert
+                ids = dict(OrderItem.objects.filter(order = order).values_list('product_id', 'id'))
+                for order_item in order_items:
+                    order_item.pk = ids[order_item.product_id]
+            # serialize the response from these objects instead of reloading them
+            order._prefetched_objects_cache = {'items': order_items}
+            # the inventory UPDATE skips post_save, refresh the read model and cache once it is visible
+            transaction.on_commit(lambda: products_updated.send(self.__class__, product_ids = list(quantities)))
             
-            Cart.objects.filter(pk = self._validated_data['cart_id']).delete()
+            # the Redis engine can't take part in the transaction, so the cart only goes once the order is in
+            cart_id = self._validated_data['cart_id']
+            transaction.on_commit(lambda: get_cart_store().delete(cart_id), robust = True)
             
-            #sending signal
-            order_created.send_robust(self.__class__ , order = order)
+            #receivers hear about the order once it's committed, through store.tasks.relay_outbox
+            publish('order_created', order_id = order.id)
             
             return order
@@ -1,9 +1,130 @@
-from ..models import Customer
-from django.db.models.signals import post_save
+from ..models import Customer, Product, ProductImage, Promotion, Collection
+from likes.models import LikedItem
+from tags.models import Tag, TaggedItem
+from ..cache import invalidate_products, invalidate_product_relations
+from ..customers import customer_cache
+from ..images import delete_renditions
+from ..tasks import process_product_image
+from ..projection import refresh_product_summaries, refresh_product_images, refresh_collection_name
+from .signal import products_updated
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.conf import settings
 
 @receiver(post_save, sender = settings.AUTH_USER_MODEL)
 def create_customer_for_user(sender, **kwargs):
     if kwargs['created']:
-        Customer.objects.create(user = kwargs['instance'])
\ No newline at end of file
+        Customer.objects.create(user = kwargs['instance'])
+
+@receiver([post_save, post_delete], sender = Customer)
+def invalidate_customer(sender, instance, **kwargs):
+    # again on commit, so a read racing the transaction can't keep the old row cached
+    customer_cache.discard(instance.user_id)
+    transaction.on_commit(lambda: customer_cache.discard(instance.user_id))
+
+
+# the read model receivers are connected before the cache ones below, so a cache
+# miss right after an invalidation already reads the refreshed summary
+
+@receiver(post_save, sender = Product)
+def refresh_product_summary(sender, instance, **kwargs):
+    refresh_product_summaries([instance.pk])
+
+@receiver([post_save, post_delete], sender = ProductImage)
+def refresh_product_summary_images(sender, instance, **kwargs):
+    refresh_product_images(instance.product_id)
+
+@receiver(post_save, sender = Collection)
+def refresh_product_summary_collection(sender, instance, created, **kwargs):
+    if not created:
+        refresh_collection_name(instance)
+
+@receiver(products_updated)
+def refresh_updated_product_summaries(sender, product_ids, **kwargs):
+    refresh_product_summaries(product_ids)
+
+
+def invalidate_products_by_id(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    collection_ids = Product.objects.filter(pk__in = product_ids)\
+        .values_list('collection_id', flat = True).distinct()
+    invalidate_products(product_ids, set(collection_ids))
+
+@receiver(pre_save, sender = Product)
+def remember_previous_collection(sender, instance, **kwargs):
+    instance._previous_collection_id = None
+    if instance.pk is not None:
+        instance._previous_collection_id = Product.objects.filter(pk = instance.pk)\
+            .values_list('collection_id', flat = True).first()
+
+@receiver(post_save, sender = Product)
+def count_saved_product(sender, instance, created, **kwargs):
+    previous_collection_id = getattr(instance, '_previous_collection_id', None)
+    if created:
+        Collection.objects.add_products_count(instance.collection_id, 1)
+    elif previous_collection_id is not None and previous_collection_id != instance.collection_id:
+        Collection.objects.add_products_count(previous_collection_id, -1)
+        Collection.objects.add_products_count(instance.collection_id, 1)
+
+@receiver(post_delete, sender = Product)
+def count_deleted_product(sender, instance, **kwargs):
+    Collection.objects.add_products_count(instance.collection_id, -1)
+
+@receiver([post_save, post_delete], sender = Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    collection_ids = {instance.collection_id, getattr(instance, '_previous_collection_id', None)}
+    invalidate_products([instance.pk], collection_ids - {None})
+
+@receiver([post_save, post_delete], sender = ProductImage)
+def invalidate_product_image_cache(sender, instance, **kwargs):
+    invalidate_products_by_id([instance.product_id])
+
+@receiver(post_save, sender = Promotion)
+@receiver(pre_delete, sender = Promotion)
+def invalidate_promotion_cache(sender, instance, **kwargs):
+    # pre_delete: the m2m rows are already gone by the time post_delete fires
+    invalidate_products_by_id(instance.product_set.values_list('pk', flat = True))
+
+@receiver(m2m_changed, sender = Product.promotions.through)
+def invalidate_product_promotions_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_products_by_id([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_products_by_id(instance.product_set.values_list('pk', flat = True))
+    else:
+        invalidate_products_by_id(pk_set)
+
+@receiver(products_updated)
+def invalidate_updated_products_cache(sender, product_ids, **kwargs):
+    invalidate_products_by_id(product_ids)
+
+# only ?include=tags,likes_count responses carry these, the plain lists stay cached
+@receiver([post_save, post_delete], sender = TaggedItem)
+@receiver([post_save, post_delete], sender = LikedItem)
+def invalidate_product_relations_cache(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Product).id:
+        invalidate_product_relations([instance.object_id])
+
+@receiver(post_save, sender = Tag)
+def invalidate_tag_cache(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_product_relations(TaggedItem.objects
+                                     .filter(tag = instance, content_type = ContentType.objects.get_for_model(Product))
+                                     .values_list('object_id', flat = True))
+
+
+@receiver(post_save, sender = ProductImage)
+def queue_product_image_processing(sender, instance, **kwargs):
+    # on commit, so the worker finds the row and the uploaded file. The upload is already
+    # in when the broker is down, the image then waits for `manage.py process_product_images`
+    transaction.on_commit(lambda: process_product_image.delay(instance.pk), robust = True)
+
+@receiver(post_delete, sender = ProductImage)
+def delete_product_image_renditions(sender, instance, **kwargs):
+    transaction.on_commit(lambda: delete_renditions(instance.renditions))
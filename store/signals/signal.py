@@ -1,3 +1,6 @@
 from django.dispatch import Signal
 
-order_created = Signal()
\ No newline at end of file
+order_created = Signal()
+
+# sent with product_ids after bulk updates that bypass post_save (e.g. QuerySet.update)
+products_updated = Signal()
@@ -0,0 +1,119 @@
+import logging
+from datetime import timedelta
+from time import perf_counter
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from core.metrics import OUTBOX_BATCH_DURATION, OUTBOX_EVENTS
+from .cache import invalidate_products
+from .images import build_renditions
+from .models import Cart, CartItem, OutboxEvent, ProductImage
+from .projection import refresh_product_images
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def purge_abandoned_carts(max_age=None, batch_size=None):
+    max_age = max_age or settings.STORE_CART_MAX_AGE
+    batch_size = batch_size or settings.STORE_CART_PURGE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    purged = {'carts': 0, 'items': 0}
+    start = perf_counter()
+    # small transactions so the deletes never hold locks on the cart tables for long
+    while True:
+        cart_ids = list(Cart.objects.filter(created_at__lt=cutoff)
+                        .order_by('created_at')
+                        .values_list('pk', flat=True)[:batch_size])
+        if not cart_ids:
+            break
+        with transaction.atomic():
+            (items, _) = CartItem.objects.filter(cart_id__in=cart_ids).delete()
+            (_, deleted) = Cart.objects.filter(pk__in=cart_ids).delete()
+        purged['items'] += items
+        purged['carts'] += deleted.get(Cart._meta.label, 0)
+    purged['seconds'] = round(perf_counter() - start, 3)
+    logger.info('Purged %(carts)d abandoned carts and %(items)d cart items in %(seconds).3fs', purged)
+    return purged
+
+
+@shared_task
+def process_product_image(image_id):
+    image = ProductImage.objects.select_related('product').filter(pk=image_id).first()
+    if image is None:
+        return None
+    start = perf_counter()
+    renditions = build_renditions(image)
+    # update() skips post_save, which would queue this task again
+    ProductImage.objects.filter(pk=image_id).update(renditions=renditions)
+    refresh_product_images(image.product_id)
+    invalidate_products([image.product_id], [image.product.collection_id])
+    logger.info('Processed product image %d in %.3fs', image_id, perf_counter() - start)
+    return renditions
+
+
+@shared_task
+def relay_outbox(batch_size=None):
+    """
+    Delivers pending outbox events to their signal's receivers, oldest first.
+    Each batch is claimed for STORE_OUTBOX_LEASE in a short transaction and
+    delivered outside of it, so receivers never run while the rows are locked.
+    A delivered event is deleted. When a receiver raises, the event is offered
+    again on the next run with its attempts counted, and the rest of its
+    receivers will see it again. After STORE_OUTBOX_MAX_ATTEMPTS failures it
+    is marked dead and left for someone to look at.
+    """
+    from .outbox import TOPICS
+    batch_size = batch_size or settings.STORE_OUTBOX_BATCH_SIZE
+    relayed = {'events': 0, 'failed': 0, 'dead': 0}
+    start = perf_counter()
+    last_id = 0
+    while True:
+        batch_start = perf_counter()
+        with transaction.atomic():
+            # skip_locked lets several workers claim batches side by side
+            events = list(OutboxEvent.objects.select_for_update(skip_locked=True)
+                          .filter(pk__gt=last_id, dead_at__isnull=True, available_at__lte=timezone.now())
+                          .order_by('pk')[:batch_size])
+            if not events:
+                break
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events])\
+                .update(available_at=timezone.now() + timedelta(seconds=settings.STORE_OUTBOX_LEASE))
+        last_id = events[-1].pk
+        failed = [event for event in events if event.topic not in TOPICS]
+        for (topic, (signal, load)) in TOPICS.items():
+            batch = [event for event in events if event.topic == topic]
+            if not batch:
+                continue
+            for (event, kwargs) in zip(batch, load([event.payload for event in batch])):
+                if kwargs is None:
+                    logger.warning('Dropping outbox event %d, its %s is gone', event.pk, topic)
+                    continue
+                errors = [response for (_, response) in signal.send_robust(OutboxEvent, **kwargs)
+                          if isinstance(response, Exception)]
+                if errors:
+                    logger.error('Outbox event %d failed in %d receivers: %r', event.pk, len(errors), errors)
+                    failed.append(event)
+        dead = [event.pk for event in failed if event.attempts + 1 >= settings.STORE_OUTBOX_MAX_ATTEMPTS]
+        retried = [event.pk for event in failed if event.pk not in dead]
+        with transaction.atomic():
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events])\
+                .exclude(pk__in=[event.pk for event in failed]).delete()
+            OutboxEvent.objects.filter(pk__in=retried).update(attempts=F('attempts') + 1, available_at=timezone.now())
+            OutboxEvent.objects.filter(pk__in=dead).update(attempts=F('attempts') + 1, dead_at=timezone.now())
+        OUTBOX_BATCH_DURATION.observe(perf_counter() - batch_start)
+        for event in events:
+            OUTBOX_EVENTS.labels(event.topic, 'dead' if event.pk in dead else 'failed' if event.pk in retried else 'relayed').inc()
+        for pk in dead:
+            logger.error('Outbox event %d failed %d times, marked dead', pk, settings.STORE_OUTBOX_MAX_ATTEMPTS)
+        relayed['events'] += len(events) - len(failed)
+        relayed['failed'] += len(failed)
+        relayed['dead'] += len(dead)
+    relayed['seconds'] = round(perf_counter() - start, 3)
+    relayed['per_second'] = round(relayed['events'] / relayed['seconds'], 1) if relayed['seconds'] else 0
+    if relayed['events'] or relayed['failed']:
+        logger.info('Relayed %(events)d outbox events (%(failed)d failed, %(dead)d dead) in %(seconds).3fs, '
+                    '%(per_second).1f events/s', relayed)
+    return relayed
@@ -1,13 +1,25 @@
 import pytest
-from rest_framework.test import APIClient
-from django.contrib.auth.models import User
 
 @pytest.fixture
-def api_client():
-    return APIClient()
+def assert_flat_queries(query_budget):
+    #make_request(size) sets up `size` rows and returns a callable that fetches them,
+    #the query count must not change with the size
+    def do_assert_flat_queries(make_request, sizes, max_queries):
+        counts = {}
+        for size in sizes:
+            fetch = make_request(size)
+            with query_budget(max_queries) as queries:
+                fetch()
+            counts[size] = len(queries)
+        assert len(set(counts.values())) == 1, f'query count grows with the page size: {counts}'
+    return do_assert_flat_queries
 
 @pytest.fixture
-def force_authentication(api_client):
-    def do_force_authentication(is_staff=True):
-        return api_client.force_authenticate(user=User(is_staff=is_staff))
-    return do_force_authentication
\ No newline at end of file
+def redis_cart_store(settings, monkeypatch):
+    #carts in an in-memory Redis, Lua scripts included
+    import fakeredis
+    from store.carts import RedisCartStore
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr('django_redis.get_redis_connection', lambda alias: redis)
+    settings.STORE_CART_ENGINE = 'store.carts.RedisCartStore'
+    return RedisCartStore()
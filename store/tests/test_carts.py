@@ -0,0 +1,303 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import connection
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+import pytest
+from model_bakery import baker
+from store.models import Cart, CartItem, Product
+from store.tasks import purge_abandoned_carts
+
+
+@pytest.fixture
+def add_to_cart(api_client):
+    def do_add_to_cart(cart, item):
+        return api_client.post(f'/store/carts/{cart.id}/items/', item)
+    return do_add_to_cart
+
+@pytest.mark.django_db
+class TestAddCartItem:
+    def test_if_product_is_new_returns_201(self, add_to_cart):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        
+        response = add_to_cart(cart, {'product_id': product.id, 'quantity': 2})
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['product_id'] == product.id
+        assert response.data['quantity'] == 2
+        
+    def test_if_product_is_in_cart_increments_quantity(self, add_to_cart):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        
+        add_to_cart(cart, {'product_id': product.id, 'quantity': 2})
+        response = add_to_cart(cart, {'product_id': product.id, 'quantity': 3})
+        
+        assert response.data['quantity'] == 5
+        assert CartItem.objects.filter(cart=cart).count() == 1
+        
+    def test_if_quantities_add_up_past_the_column_they_are_capped(self, add_to_cart):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        
+        add_to_cart(cart, {'product_id': product.id, 'quantity': 20000})
+        response = add_to_cart(cart, {'product_id': product.id, 'quantity': 20000})
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['quantity'] == CartItem.max_quantity
+        
+    def test_if_product_not_exists_returns_400(self, add_to_cart):
+        cart = baker.make(Cart)
+        
+        response = add_to_cart(cart, {'product_id': 0, 'quantity': 1})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['product_id'] is not None
+        assert not CartItem.objects.exists()
+        
+
+@pytest.mark.django_db
+class TestDeleteCart:
+    def test_if_cart_has_items_deletes_both_in_three_queries(self, api_client, query_budget):
+        cart = baker.make(Cart)
+        for product in baker.make(Product, unit_price=10, _quantity=3):
+            baker.make(CartItem, cart=cart, product=product, quantity=1)
+        
+        #the cart's SELECT and the two DELETEs
+        with query_budget(3):
+            response = api_client.delete(f'/store/carts/{cart.id}/')
+        
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not Cart.objects.exists()
+        assert not CartItem.objects.exists()
+        
+    def test_if_cart_not_exists_returns_404(self, api_client):
+        response = api_client.delete(f'/store/carts/{Cart().id}/')
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentAddCartItem:
+    def test_if_many_clients_add_same_product_no_update_is_lost(self):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        
+        def add(_):
+            try:
+                return APIClient().post(f'/store/carts/{cart.id}/items/',
+                                        {'product_id': product.id, 'quantity': 1}).status_code
+            finally:
+                connection.close()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            status_codes = list(executor.map(add, range(40)))
+        
+        assert set(status_codes) == {status.HTTP_201_CREATED}
+        assert CartItem.objects.get(cart=cart, product=product).quantity == 40
+        
+
+@pytest.fixture
+def batch_cart_items(api_client):
+    def do_batch_cart_items(cart, changes):
+        return api_client.post(f'/store/carts/{cart.id}/items/batch/', changes, format='json')
+    return do_batch_cart_items
+
+@pytest.mark.django_db
+class TestBatchCartItems:
+    def test_if_changes_are_valid_applies_all_of_them(self, batch_cart_items):
+        cart = baker.make(Cart)
+        (added, updated, deleted, new) = baker.make(Product, unit_price=10, _quantity=4)
+        baker.make(CartItem, cart=cart, product=added, quantity=1)
+        baker.make(CartItem, cart=cart, product=updated, quantity=1)
+        baker.make(CartItem, cart=cart, product=deleted, quantity=1)
+        
+        response = batch_cart_items(cart, {
+            'add': [{'product_id': added.id, 'quantity': 2}, {'product_id': new.id, 'quantity': 3}],
+            'update': [{'product_id': updated.id, 'quantity': 5}],
+            'delete': [deleted.id]
+        })
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity')) == {
+            added.id: 3,
+            updated.id: 5,
+            new.id: 3
+        }
+        assert len(response.data) == 3
+        
+    def test_if_any_product_not_exists_returns_400_and_changes_nothing(self, batch_cart_items):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        
+        response = batch_cart_items(cart, {
+            'add': [{'product_id': product.id, 'quantity': 1}, {'product_id': 0, 'quantity': 1}]
+        })
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CartItem.objects.exists()
+        
+    def test_if_quantity_overflows_column_returns_400(self, batch_cart_items):
+        cart = baker.make(Cart)
+        product = baker.make(Product, unit_price=10)
+        
+        response = batch_cart_items(cart, {'add': [{'product_id': product.id, 'quantity': 10 ** 9}]})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CartItem.objects.exists()
+        
+    def test_if_added_quantity_sums_past_column_returns_400_and_changes_nothing(self, batch_cart_items):
+        cart = baker.make(Cart)
+        (product, deleted) = baker.make(Product, unit_price=10, _quantity=2)
+        baker.make(CartItem, cart=cart, product=product, quantity=30000)
+        baker.make(CartItem, cart=cart, product=deleted, quantity=1)
+        
+        response = batch_cart_items(cart, {'add': [{'product_id': product.id, 'quantity': 5000}], 'delete': [deleted.id]})
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert dict(CartItem.objects.values_list('product_id', 'quantity')) == {product.id: 30000, deleted.id: 1}
+        
+    def test_if_cart_not_exists_returns_404(self, batch_cart_items):
+        response = batch_cart_items(Cart(), {'delete': []})
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestRedisCartStore:
+    def test_if_cart_is_created_it_is_empty_and_expires(self, redis_cart_store, settings):
+        cart = redis_cart_store.create()
+        
+        assert redis_cart_store.exists(cart.id)
+        assert list(redis_cart_store.get(cart.id).items.all()) == []
+        assert 0 < redis_cart_store.redis.ttl(redis_cart_store.key(cart.id)) <= settings.STORE_CART_TTL
+        
+    def test_if_product_is_added_twice_quantities_add_up(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        
+        redis_cart_store.add_item(cart.id, product.id, 2)
+        item = redis_cart_store.add_item(cart.id, product.id, 3)
+        
+        assert item.quantity == 5
+        assert redis_cart_store.get_quantities(cart.id) == {product.id: 5}
+        (loaded,) = redis_cart_store.get(cart.id).items.all()
+        assert (loaded.product, loaded.quantity) == (product, 5)
+        
+    def test_if_quantities_add_up_past_the_column_they_are_capped(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        
+        redis_cart_store.add_item(cart.id, product.id, 20000)
+        item = redis_cart_store.add_item(cart.id, product.id, 20000)
+        
+        assert item.quantity == CartItem.max_quantity
+        assert redis_cart_store.get_quantities(cart.id) == {product.id: CartItem.max_quantity}
+        
+    def test_if_product_not_exists_nothing_is_added(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        
+        assert redis_cart_store.add_item(cart.id, 0, 1) is None
+        assert redis_cart_store.get_quantities(cart.id) == {}
+        
+    def test_if_quantity_is_set_item_is_updated(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        redis_cart_store.add_item(cart.id, product.id, 2)
+        
+        redis_cart_store.set_quantity(redis_cart_store.get_item(cart.id, product.id), 7)
+        
+        assert redis_cart_store.get_item(cart.id, product.id).quantity == 7
+        
+    def test_if_item_is_removed_it_is_gone(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        redis_cart_store.add_item(cart.id, product.id, 2)
+        
+        redis_cart_store.remove_item(redis_cart_store.get_item(cart.id, product.id))
+        
+        assert redis_cart_store.get_item(cart.id, product.id) is None
+        assert redis_cart_store.exists(cart.id)
+        
+    def test_if_batch_is_applied_adds_sets_and_deletes(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        (added, updated, deleted) = baker.make(Product, unit_price=10, _quantity=3)
+        for product in [added, updated, deleted]:
+            redis_cart_store.add_item(cart.id, product.id, 1)
+        
+        items = redis_cart_store.apply_batch(cart.id, {added.id: 2}, {updated.id: 5}, [deleted.id])
+        
+        assert {item.product_id: item.quantity for item in items} == {added.id: 3, updated.id: 5}
+        
+    def test_if_batch_adds_past_the_column_nothing_is_applied(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        (product, deleted) = baker.make(Product, unit_price=10, _quantity=2)
+        redis_cart_store.add_item(cart.id, product.id, 30000)
+        redis_cart_store.add_item(cart.id, deleted.id, 1)
+        
+        with pytest.raises(ValidationError):
+            redis_cart_store.apply_batch(cart.id, {product.id: 5000}, {}, [deleted.id])
+        
+        assert redis_cart_store.get_quantities(cart.id) == {product.id: 30000, deleted.id: 1}
+        
+    def test_if_cart_expired_a_late_batch_does_not_revive_it(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        redis_cart_store.redis.delete(redis_cart_store.key(cart.id))
+        
+        with pytest.raises(Http404):
+            redis_cart_store.apply_batch(cart.id, {product.id: 1}, {}, [])
+        
+        assert not redis_cart_store.exists(cart.id)
+        
+    def test_if_cart_is_deleted_it_is_gone(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        
+        assert redis_cart_store.delete(cart.id)
+        assert not redis_cart_store.exists(cart.id)
+        assert redis_cart_store.get(cart.id) is None
+        assert not redis_cart_store.delete(cart.id)
+        
+    def test_if_cart_is_written_its_expiry_is_renewed(self, redis_cart_store, settings):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        key = redis_cart_store.key(cart.id)
+        redis_cart_store.redis.expire(key, 5)
+        
+        redis_cart_store.add_item(cart.id, product.id, 1)
+        
+        assert redis_cart_store.redis.ttl(key) > 5
+        
+    def test_if_cart_expired_a_late_write_does_not_revive_it(self, redis_cart_store):
+        cart = redis_cart_store.create()
+        product = baker.make(Product, unit_price=10)
+        redis_cart_store.redis.delete(redis_cart_store.key(cart.id))
+        
+        with pytest.raises(Http404):
+            redis_cart_store.add_item(cart.id, product.id, 1)
+        
+        assert not redis_cart_store.exists(cart.id)
+        
+    def test_if_cart_id_is_malformed_nothing_is_found(self, redis_cart_store):
+        assert not redis_cart_store.exists('not-a-uuid')
+        assert redis_cart_store.get('not-a-uuid') is None
+        assert redis_cart_store.get_quantities('not-a-uuid') == {}
+
+
+@pytest.mark.django_db
+class TestPurgeAbandonedCarts:
+    def test_if_carts_are_old_deletes_them_in_batches(self):
+        old_carts = baker.make(Cart, _quantity=5)
+        baker.make(CartItem, cart=old_carts[0], product=baker.make(Product, unit_price=10), quantity=1)
+        Cart.objects.filter(pk__in=[cart.pk for cart in old_carts])\
+            .update(created_at=timezone.now() - timedelta(days=31))
+        new_cart = baker.make(Cart)
+        
+        purged = purge_abandoned_carts(max_age=30 * 24 * 60 * 60, batch_size=2)
+        
+        assert purged['carts'] == 5
+        assert purged['items'] == 1
+        assert list(Cart.objects.values_list('pk', flat=True)) == [new_cart.pk]
@@ -1,7 +1,7 @@
 from rest_framework import status
 import pytest
 from model_bakery import baker
-from store.models import Collection
+from store.models import Collection, Product
 from rest_framework.test import APIClient
 
 @pytest.fixture
@@ -73,4 +73,46 @@ class TestRetrieveCollection:
         api_client = APIClient()
         response = api_client.get(f"/store/collections/{collection_id}/")
         
-        assert response.status_code == status.HTTP_404_NOT_FOUND
\ No newline at end of file
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+class TestCollectionProductsCount:
+    def test_if_products_are_added_moved_and_deleted_count_follows(self):
+        (old, new) = baker.make(Collection, _quantity=2)
+        product = baker.make(Product, collection=old)
+        baker.make(Product, collection=old)
+        
+        product.collection = new
+        product.save()
+        Product.objects.filter(collection=old).delete()
+        
+        assert Collection.objects.get(pk=old.pk).products_count == 0
+        assert Collection.objects.get(pk=new.pk).products_count == 1
+        
+    def test_if_count_drifts_reconcile_fixes_it(self):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, _quantity=2)
+        Collection.objects.filter(pk=collection.pk).update(products_count=7)
+        
+        fixed = Collection.objects.reconcile_products_count()
+        
+        assert fixed == 1
+        assert Collection.objects.get(pk=collection.pk).products_count == 2
+        
+    def test_if_collection_has_products_delete_returns_400(self, api_client, force_authentication):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection)
+        force_authentication(is_staff=True)
+        
+        response = api_client.delete(f'/store/collections/{collection.id}/')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert Collection.objects.filter(pk=collection.pk).exists()
+        
+    def test_if_collection_is_empty_delete_returns_204(self, api_client, force_authentication):
+        collection = baker.make(Collection)
+        force_authentication(is_staff=True)
+        
+        response = api_client.delete(f'/store/collections/{collection.id}/')
+        
+        assert response.status_code == status.HTTP_204_NO_CONTENT
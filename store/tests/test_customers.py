@@ -0,0 +1,48 @@
+from django.conf import settings
+from rest_framework import status
+import pytest
+from model_bakery import baker
+from store.customers import resolve_customer
+from store.models import Customer
+
+
+@pytest.mark.django_db
+class TestResolveCustomer:
+    def test_if_customer_is_resolved_again_runs_no_query(self, django_assert_num_queries):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        resolve_customer(user.id)
+        
+        with django_assert_num_queries(0):
+            ref = resolve_customer(user.id)
+        
+        assert ref.id == user.customer.id
+        
+    def test_if_customer_is_saved_membership_is_refreshed(self):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        resolve_customer(user.id)
+        
+        Customer.objects.filter(user=user).update(membership=Customer.MEMBERSHIP_GOLD)
+        stale = resolve_customer(user.id)
+        customer = Customer.objects.get(user=user)
+        customer.save()
+        
+        assert stale.membership == Customer.MEMBERSHIP_BRONZE
+        assert resolve_customer(user.id).membership == Customer.MEMBERSHIP_GOLD
+        
+    def test_if_customer_is_missing_create_adds_it(self):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        Customer.objects.filter(user=user).delete()
+        
+        assert resolve_customer(user.id) is None
+        assert resolve_customer(user.id, create=True).id == Customer.objects.get(user=user).id
+        
+    def test_if_orders_are_listed_again_customer_query_is_skipped(self, api_client, query_budget):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        api_client.get('/store/order/')
+        
+        with query_budget(1) as queries:
+            response = api_client.get('/store/order/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert 'store_customer' not in queries[0]['sql']
@@ -0,0 +1,229 @@
+from django.conf import settings
+from django.db import connection
+from kombu.exceptions import OperationalError
+from rest_framework import status
+import pytest
+from model_bakery import baker
+from prometheus_client import REGISTRY
+from store.customers import resolve_customer
+from store.models import Cart, CartItem, Order, OrderItem, OutboxEvent, Product
+from store.signals.signal import order_created
+from store.tasks import relay_outbox
+
+
+@pytest.fixture
+def authenticate(api_client):
+    def do_authenticate():
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        return user
+    return do_authenticate
+
+@pytest.fixture
+def create_order(api_client):
+    def do_create_order(cart):
+        return api_client.post('/store/order/', {'cart_id': cart.id})
+    return do_create_order
+
+@pytest.fixture
+def make_cart():
+    def do_make_cart(*quantities, inventory=10):
+        cart = baker.make(Cart)
+        for quantity in quantities:
+            baker.make(CartItem, cart=cart, product=baker.make(Product, unit_price=10, inventory=inventory), quantity=quantity)
+        return cart
+    return do_make_cart
+
+@pytest.mark.django_db
+class TestCreateOrder:
+    def test_if_user_is_anonymous_returns_401(self, create_order, make_cart):
+        response = create_order(make_cart(1))
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        
+    def test_if_cart_is_valid_creates_order_and_reserves_inventory(self, authenticate, create_order, make_cart, django_capture_on_commit_callbacks):
+        authenticate()
+        cart = make_cart(2, 3)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = create_order(cart)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['items']) == 2
+        assert sorted(Product.objects.values_list('inventory', flat=True)) == [7, 8]
+        assert not Cart.objects.filter(pk=cart.pk).exists()
+        
+    def test_if_order_is_rolled_back_redis_cart_is_kept(self, authenticate, create_order, redis_cart_store, monkeypatch):
+        authenticate()
+        cart = redis_cart_store.create()
+        redis_cart_store.add_item(cart.id, baker.make(Product, unit_price=10, inventory=10).id, 2)
+        def fail(*args, **kwargs):
+            raise RuntimeError('publish failed')
+        monkeypatch.setattr('store.serializers.publish', fail)
+        
+        with pytest.raises(RuntimeError):
+            create_order(cart)
+        
+        assert redis_cart_store.get_quantities(cart.id) != {}
+        assert not Order.objects.exists()
+        
+    def test_if_inventory_is_short_returns_400_and_changes_nothing(self, authenticate, create_order, make_cart):
+        authenticate()
+        cart = make_cart(2, 11)
+        
+        response = create_order(cart)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['cart_id'] is not None
+        assert list(Product.objects.values_list('inventory', flat=True)) == [10, 10]
+        assert not Order.objects.exists()
+        assert Cart.objects.filter(pk=cart.pk).exists()
+        
+    def test_if_cart_is_empty_returns_400(self, authenticate, create_order, make_cart):
+        authenticate()
+        
+        response = create_order(make_cart())
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+    def test_if_cart_grows_query_count_stays_the_same(self, authenticate, create_order, make_cart, assert_flat_queries):
+        user = authenticate()
+        resolve_customer(user.id)
+        def make_request(size):
+            cart = make_cart(*[1] * size)
+            def fetch():
+                response = create_order(cart)
+                assert response.status_code == status.HTTP_200_OK
+                assert len(response.data['items']) == size
+            return fetch
+        
+        assert_flat_queries(make_request, [1, 10], max_queries=12)
+        
+
+@pytest.mark.django_db
+class TestListOrders:
+    def test_if_orders_and_items_grow_query_count_stays_the_same(self, api_client, authenticate, assert_flat_queries):
+        def make_request(size):
+            user = authenticate()
+            for order in baker.make(Order, customer=user.customer, _quantity=size):
+                baker.make(OrderItem, order=order, product=baker.make(Product), _quantity=3)
+            def fetch():
+                response = api_client.get('/store/order/')
+                assert response.status_code == status.HTTP_200_OK
+                assert len(response.data) == size
+                assert all(len(order['items']) == 3 for order in response.data)
+            return fetch
+        
+        assert_flat_queries(make_request, [1, 5], max_queries=3)
+    
+    def test_if_order_is_retrieved_items_are_prefetched(self, api_client, authenticate, query_budget):
+        user = authenticate()
+        order = baker.make(Order, customer=user.customer)
+        baker.make(OrderItem, order=order, product=baker.make(Product), _quantity=5)
+        
+        with query_budget(3):
+            response = api_client.get(f'/store/order/{order.id}/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['items']) == 5
+
+
+def outbox_events(result):
+    return REGISTRY.get_sample_value('outbox_events_total', {'topic': 'order_created', 'result': result}) or 0
+
+@pytest.fixture
+def order_receiver():
+    received = []
+    def receiver(sender, order, **kwargs):
+        if getattr(receiver, 'fail', False):
+            raise RuntimeError('receiver failed')
+        received.append(order.id)
+    receiver.received = received
+    order_created.connect(receiver)
+    yield receiver
+    order_created.disconnect(receiver)
+
+@pytest.mark.django_db
+class TestOrderCreatedOutbox:
+    def test_if_order_is_created_receivers_wait_for_the_relay(self, authenticate, create_order, make_cart, order_receiver):
+        authenticate()
+        
+        order_id = create_order(make_cart(1)).data['id']
+        
+        assert order_receiver.received == []
+        assert OutboxEvent.objects.get().payload == {'order_id': order_id}
+        relayed = relay_outbox()
+        assert relayed['events'] == 1
+        assert order_receiver.received == [order_id]
+        assert not OutboxEvent.objects.exists()
+        
+    def test_if_receiver_fails_event_is_kept_for_the_next_run(self, authenticate, create_order, make_cart, order_receiver):
+        authenticate()
+        create_order(make_cart(1))
+        order_receiver.fail = True
+        
+        relayed = relay_outbox()
+        order_receiver.fail = False
+        relay_outbox()
+        
+        assert relayed['failed'] == 1
+        assert len(order_receiver.received) == 1
+        assert not OutboxEvent.objects.exists()
+        
+    def test_if_receiver_keeps_failing_event_is_marked_dead(self, authenticate, create_order, make_cart, order_receiver, settings):
+        settings.STORE_OUTBOX_MAX_ATTEMPTS = 2
+        authenticate()
+        create_order(make_cart(1))
+        order_receiver.fail = True
+        (failed, dead) = (outbox_events('failed'), outbox_events('dead'))
+        
+        relayed = [relay_outbox() for _ in range(3)]
+        
+        assert (outbox_events('failed'), outbox_events('dead')) == (failed + 1, dead + 1)
+        assert [run['failed'] for run in relayed] == [1, 1, 0]
+        assert relayed[1]['dead'] == 1
+        event = OutboxEvent.objects.get()
+        assert event.attempts == 2
+        assert event.dead_at is not None
+        
+    def test_receivers_run_outside_the_claiming_transaction(self, authenticate, create_order, make_cart, order_receiver):
+        authenticate()
+        create_order(make_cart(1))
+        #the test itself runs in a transaction, count the blocks opened on top of it
+        depth = len(connection.atomic_blocks)
+        depths = []
+        order_created.connect(lambda sender, **kwargs: depths.append(len(connection.atomic_blocks)), weak=False, dispatch_uid='depth')
+        try:
+            relay_outbox()
+        finally:
+            order_created.disconnect(dispatch_uid='depth')
+        
+        assert depths == [depth]
+        
+    def test_if_broker_is_down_order_is_still_created(self, authenticate, create_order, make_cart, monkeypatch, django_capture_on_commit_callbacks):
+        authenticate()
+        def broker_down(*args, **kwargs):
+            raise OperationalError('Connection refused')
+        monkeypatch.setattr(relay_outbox, 'delay', broker_down)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = create_order(make_cart(1))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert Order.objects.count() == 1
+        assert OutboxEvent.objects.count() == 1
+        
+    def test_if_events_exceed_the_batch_all_are_relayed(self, order_receiver):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        orders = baker.make(Order, customer=user.customer, _quantity=5)
+        OutboxEvent.objects.bulk_create([OutboxEvent(topic='order_created', payload={'order_id': order.id}) for order in orders])
+        events = outbox_events('relayed')
+        batches = REGISTRY.get_sample_value('outbox_batch_duration_seconds_count') or 0
+        
+        relayed = relay_outbox(batch_size=2)
+        
+        assert relayed['events'] == 5
+        assert outbox_events('relayed') == events + 5
+        assert REGISTRY.get_sample_value('outbox_batch_duration_seconds_count') == batches + 3
+        assert sorted(order_receiver.received) == sorted(order.id for order in orders)
+
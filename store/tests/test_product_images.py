@@ -0,0 +1,158 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from io import BytesIO
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIRequestFactory
+from PIL import Image
+from rest_framework import status
+import pytest
+from model_bakery import baker
+from store.models import Product, ProductImage
+from store.tasks import process_product_image
+from store.uploadhandlers import StoredUploadedFile
+from store.views import ProductImageViewSets
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+@pytest.fixture
+def upload_image(api_client):
+    def do_upload_image(product, size=(1600, 1200), format='PNG', name='photo.png', mode='RGB', color='red'):
+        buffer = BytesIO()
+        Image.new(mode, size, color).save(buffer, format=format)
+        upload = SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+        return api_client.post(f'/store/products/{product.id}/images/', {'image': upload}, format='multipart')
+    return do_upload_image
+
+@pytest.mark.django_db
+class TestProductImagePipeline:
+    def test_if_image_is_processed_renditions_fit_their_size(self, upload_image):
+        product = baker.make(Product, unit_price=10)
+        response = upload_image(product)
+        
+        renditions = process_product_image(response.data['id'])
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert set(renditions) == {'thumbnail', 'medium'}
+        assert set(renditions['thumbnail']) == {'jpeg', 'webp'}
+        image = ProductImage.objects.get(pk=response.data['id'])
+        with image.image.storage.open(image.renditions['medium']['webp']) as file:
+            assert Image.open(file).size == (800, 600)
+            
+    def test_if_image_is_transparent_jpeg_renditions_are_white_there(self, upload_image):
+        product = baker.make(Product, unit_price=10)
+        response = upload_image(product, mode='RGBA', color=(0, 0, 0, 0))
+        
+        process_product_image(response.data['id'])
+        
+        image = ProductImage.objects.get(pk=response.data['id'])
+        with image.image.storage.open(image.renditions['thumbnail']['jpeg']) as file:
+            assert min(Image.open(file).getpixel((0, 0))) > 250
+            
+    def test_if_product_is_listed_only_renditions_are_served(self, api_client, upload_image):
+        product = baker.make(Product, unit_price=10)
+        image_id = upload_image(product).data['id']
+        process_product_image(image_id)
+        
+        response = api_client.get(f'/store/products/{product.id}/')
+        
+        (image,) = response.data['image']
+        assert image['id'] == image_id
+        assert image['renditions']['thumbnail']['webp'].startswith('http://testserver/')
+        assert 'photo' not in str(response.data)
+
+
+@pytest.mark.django_db
+class TestProductImageUpload:
+    def test_if_broker_is_down_upload_still_succeeds(self, upload_image, monkeypatch, django_capture_on_commit_callbacks):
+        product = baker.make(Product, unit_price=10)
+        def broker_down(*args, **kwargs):
+            raise OperationalError('Connection refused')
+        monkeypatch.setattr(process_product_image, 'delay', broker_down)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            response = upload_image(product)
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert ProductImage.objects.get(pk=response.data['id']).renditions == {}
+        
+    def test_if_image_is_valid_it_is_stored_once(self, upload_image, tmp_path):
+        product = baker.make(Product, unit_price=10)
+        
+        response = upload_image(product)
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        image = ProductImage.objects.get(pk=response.data['id'])
+        assert [path.name for path in (tmp_path / 'store/media').iterdir()] == [image.image.name.split('/')[-1]]
+        
+    def test_if_file_is_not_an_image_returns_400_and_keeps_nothing(self, api_client, tmp_path):
+        product = baker.make(Product, unit_price=10)
+        upload = SimpleUploadedFile('photo.png', b'MZ' + b'\0' * 1000, content_type='image/png')
+        
+        response = api_client.post(f'/store/products/{product.id}/images/', {'image': upload}, format='multipart')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['image'] is not None
+        assert not ProductImage.objects.exists()
+        assert not any(path.is_file() for path in tmp_path.rglob('*'))
+        
+    def test_if_image_grows_too_large_returns_400_and_keeps_nothing(self, api_client, monkeypatch, tmp_path):
+        product = baker.make(Product, unit_price=10)
+        monkeypatch.setattr('store.uploadhandlers.MAX_IMAGE_SIZE', 64 * 1024)
+        #under the announced size limit, so it is the running size that stops it
+        upload = SimpleUploadedFile('photo.png', b'\x89PNG\r\n\x1a\n' + b'\0' * 100 * 1024, content_type='image/png')
+        
+        response = api_client.post(f'/store/products/{product.id}/images/', {'image': upload}, format='multipart')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'KB' in response.data['image'][0]
+        assert not any(path.is_file() for path in tmp_path.rglob('*'))
+        
+    def test_if_announced_size_is_too_large_body_is_not_read(self, monkeypatch, tmp_path):
+        product = baker.make(Product, unit_price=10)
+        monkeypatch.setattr('store.uploadhandlers.MAX_IMAGE_SIZE', 64 * 1024)
+        upload = SimpleUploadedFile('photo.png', b'\x89PNG\r\n\x1a\n' + b'\0' * 1024 * 1024, content_type='image/png')
+        request = APIRequestFactory().post(f'/store/products/{product.id}/images/', {'image': upload}, format='multipart')
+        read = []
+        stream_read = request._stream.read
+        def counted_read(*args):
+            data = stream_read(*args)
+            read.append(len(data))
+            return data
+        request._stream.read = counted_read
+        
+        response = ProductImageViewSets.as_view({'post': 'create'})(request, products_pk=product.id)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'KB' in response.data['image'][0]
+        assert sum(read) < 256 * 1024
+        assert not any(path.is_file() for path in tmp_path.rglob('*'))
+        
+    def test_if_upload_succeeds_stored_file_is_closed(self, monkeypatch):
+        product = baker.make(Product, unit_price=10)
+        uploads = []
+        class RecordedUploadedFile(StoredUploadedFile):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                uploads.append(self)
+        monkeypatch.setattr('store.uploadhandlers.StoredUploadedFile', RecordedUploadedFile)
+        buffer = BytesIO()
+        Image.new('RGB', (100, 100), 'red').save(buffer, format='PNG')
+        upload = SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+        request = APIRequestFactory().post(f'/store/products/{product.id}/images/', {'image': upload}, format='multipart')
+        
+        #called directly, so nothing closes the request's files after the response
+        response = ProductImageViewSets.as_view({'post': 'create'})(request, products_pk=product.id)
+        
+        assert response.status_code == status.HTTP_201_CREATED
+        assert [upload.closed for upload in uploads] == [True]
+        
+    def test_if_image_is_corrupted_returns_400_and_keeps_nothing(self, api_client, tmp_path):
+        product = baker.make(Product, unit_price=10)
+        upload = SimpleUploadedFile('photo.png', b'\x89PNG\r\n\x1a\n' + b'\0' * 1000, content_type='image/png')
+        
+        response = api_client.post(f'/store/products/{product.id}/images/', {'image': upload}, format='multipart')
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not any(path.is_file() for path in tmp_path.rglob('*'))
@@ -0,0 +1,204 @@
+from rest_framework import status
+import pytest
+from model_bakery import baker
+from django.conf import settings
+from django.db import transaction
+from decimal import Decimal
+from likes.models import LikedItem
+from store.cache import get_version, product_version_key
+from store.models import Collection, Product
+from store.search import InvertedIndexSearch
+from tags.models import Tag, TaggedItem
+
+
+@pytest.mark.django_db
+class TestRetrieveProduct:
+    def test_if_product_exists_returns_200(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        
+        response = api_client.get(f'/store/products/{product.id}/')
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['id'] == product.id
+        assert response.data['title'] == product.title
+        assert response.data['price_with_tax'] == Decimal('11.00')
+
+    def test_if_product_not_exists_returns_404(self, api_client):
+        response = api_client.get('/store/products/0/')
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        
+    def test_if_product_is_updated_returns_fresh_data(self, api_client):
+        product = baker.make(Product, title='a', unit_price=10)
+        api_client.get(f'/store/products/{product.id}/')
+        
+        product.title = 'b'
+        product.save()
+        response = api_client.get(f'/store/products/{product.id}/')
+        
+        assert response.data['title'] == 'b'
+        
+    def test_if_product_is_saved_in_a_transaction_version_is_bumped_after_commit(self, django_capture_on_commit_callbacks):
+        product = baker.make(Product, title='a', unit_price=10)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                product.title = 'b'
+                product.save()
+                #what a read racing the commit would cache under
+                version = get_version(product_version_key(product.id))
+        
+        assert get_version(product_version_key(product.id)) != version
+
+
+@pytest.mark.django_db
+class TestListProducts:
+    def test_if_product_is_added_to_collection_list_is_refreshed(self, api_client):
+        collection = baker.make(Collection)
+        baker.make(Product, collection=collection, unit_price=10)
+        api_client.get(f'/store/products/?collection_id={collection.id}')
+        
+        baker.make(Product, collection=collection, unit_price=10)
+        response = api_client.get(f'/store/products/?collection_id={collection.id}')
+        
+        assert response.data['count'] == 2
+        
+    def test_if_page_grows_query_count_stays_the_same(self, api_client, assert_flat_queries):
+        def make_request(size):
+            collection = baker.make(Collection)
+            baker.make(Product, collection=collection, unit_price=10, _quantity=size)
+            def fetch():
+                response = api_client.get(f'/store/products/?collection_id={collection.id}')
+                assert len(response.data['results']) == size
+            return fetch
+        
+        assert_flat_queries(make_request, [1, 10], max_queries=3)
+        
+    def test_if_product_moves_collection_old_list_is_refreshed(self, api_client):
+        (old, new) = baker.make(Collection, _quantity=2)
+        product = baker.make(Product, collection=old, unit_price=10)
+        api_client.get(f'/store/products/?collection_id={old.id}')
+        
+        product.collection = new
+        product.save()
+        response = api_client.get(f'/store/products/?collection_id={old.id}')
+        
+        assert response.data['count'] == 0
+        
+    def test_if_inventory_is_cleared_in_admin_list_is_refreshed(self, api_client, client):
+        product = baker.make(Product, inventory=5, unit_price=10)
+        api_client.get('/store/products/')
+        
+        client.force_login(baker.make(settings.AUTH_USER_MODEL, is_staff=True, is_superuser=True))
+        client.post('/admin/store/product/', {
+            'action': 'clear_inventory',
+            '_selected_action': [product.id]
+        })
+        response = api_client.get('/store/products/')
+        
+        assert response.data['results'][0]['inventory'] == 0
+        
+    def test_if_cursor_pagination_is_requested_walks_all_products_without_count(self, api_client):
+        products = baker.make(Product, unit_price=10, _quantity=25)
+        
+        seen = []
+        url = '/store/products/?pagination=cursor&ordering=-unit_price'
+        while url:
+            response = api_client.get(url)
+            assert 'count' not in response.data
+            seen += [product['id'] for product in response.data['results']]
+            url = response.data['next']
+        
+        assert sorted(seen) == sorted(product.id for product in products)
+        assert len(seen) == len(set(seen))
+        
+    def test_if_cursor_is_invalid_returns_404(self, api_client):
+        response = api_client.get('/store/products/?cursor=abc')
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# InnoDB only adds rows to a FULLTEXT index on commit
+@pytest.mark.django_db(transaction=True)
+class TestSearchProducts:
+    def test_if_all_terms_match_returns_product(self, api_client):
+        baker.make(Product, title='Red shirt', unit_price=10)
+        baker.make(Product, title='Blue shirt', unit_price=10)
+        baker.make(Product, title='Red hat', unit_price=10)
+        
+        response = api_client.get('/store/products/?search=red shirt')
+        
+        assert [product['title'] for product in response.data['results']] == ['Red shirt']
+        
+    def test_if_term_is_a_prefix_returns_ranked_products(self, api_client):
+        baker.make(Product, title='Shirt', description='cotton shirt', unit_price=10)
+        baker.make(Product, title='Shirt', description='linen', unit_price=10)
+        baker.make(Product, title='Hat', description='wool', unit_price=10)
+        
+        response = api_client.get('/store/products/?search=shi')
+        
+        assert [product['description'] for product in response.data['results']] == ['cotton shirt', 'linen']
+        
+    def test_if_term_is_common_in_process_index_caps_the_matches(self):
+        backend = InvertedIndexSearch()
+        backend.candidate_limit = 3
+        baker.make(Product, title='Scarf', unit_price=10, _quantity=5)
+        
+        products = backend.search(Product.objects.all(), ['title'], ['scarf'])
+        
+        assert products.count() == 3
+        
+    def test_if_product_is_added_it_is_searchable(self, api_client):
+        api_client.get('/store/products/?search=scarf')
+        
+        baker.make(Product, title='Scarf', unit_price=10)
+        response = api_client.get('/store/products/?search=scarf')
+        
+        assert response.data['count'] == 1
+
+
+@pytest.mark.django_db
+class TestProductRelations:
+    def test_if_relations_are_included_list_loads_them_in_one_query_each(self, api_client, assert_flat_queries):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        def make_request(size):
+            collection = baker.make(Collection)
+            for product in baker.make(Product, collection=collection, unit_price=10, _quantity=size):
+                baker.make(TaggedItem, content_object=product, tag=baker.make(Tag, label='sale'))
+                baker.make(LikedItem, content_object=product, user=user)
+            def fetch():
+                response = api_client.get(f'/store/products/?collection_id={collection.id}&include=tags,likes_count')
+                assert [product['likes_count'] for product in response.data['results']] == [1] * size
+                assert all(product['tags'][0]['label'] == 'sale' for product in response.data['results'])
+            return fetch
+        
+        assert_flat_queries(make_request, [1, 10], max_queries=5)
+        
+    def test_if_product_is_liked_cached_detail_is_refreshed(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        api_client.get(f'/store/products/{product.id}/?include=likes_count')
+        
+        baker.make(LikedItem, content_object=product)
+        response = api_client.get(f'/store/products/{product.id}/?include=likes_count')
+        
+        assert response.data['likes_count'] == 1
+        
+    def test_if_product_is_liked_included_list_is_refreshed_and_plain_list_is_not(self, api_client, django_assert_num_queries):
+        product = baker.make(Product, unit_price=10)
+        api_client.get('/store/products/')
+        api_client.get('/store/products/?include=likes_count')
+        
+        baker.make(LikedItem, content_object=product)
+        with django_assert_num_queries(0):
+            api_client.get('/store/products/')
+        response = api_client.get('/store/products/?include=likes_count')
+        
+        assert response.data['results'][0]['likes_count'] == 1
+        
+    def test_if_relations_are_not_included_fields_are_absent(self, api_client):
+        product = baker.make(Product, unit_price=10)
+        
+        response = api_client.get(f'/store/products/{product.id}/')
+        
+        assert 'tags' not in response.data
+        assert 'likes_count' not in response.data
@@ -0,0 +1,43 @@
+import pytest
+from model_bakery import baker
+from decimal import Decimal
+from store.models import Collection, Product, ProductImage, ProductSummary
+from store.projection import rebuild_product_summaries
+
+
+@pytest.mark.django_db
+class TestProductSummaries:
+    def test_if_summaries_are_missing_rebuild_restores_them(self):
+        collection = baker.make(Collection, name='Fruits')
+        products = baker.make(Product, collection=collection, unit_price=10, _quantity=3)
+        ProductSummary.objects.all().delete()
+        
+        rebuilt = rebuild_product_summaries(batch_size=2)
+        
+        assert rebuilt == 3
+        summaries = ProductSummary.objects.in_bulk()
+        assert set(summaries) == {product.id for product in products}
+        summary = summaries[products[0].id]
+        assert summary.title == products[0].title
+        assert summary.price_with_tax == Decimal('11.00')
+        assert summary.collection_name == 'Fruits'
+        
+    def test_if_collection_is_renamed_summaries_are_refreshed(self):
+        collection = baker.make(Collection, name='Fruits')
+        product = baker.make(Product, collection=collection, unit_price=10)
+        
+        collection.name = 'Vegetables'
+        collection.save()
+        
+        assert ProductSummary.objects.get(pk=product.id).collection_name == 'Vegetables'
+        
+    def test_if_image_is_added_or_deleted_summary_images_are_refreshed(self):
+        product = baker.make(Product, unit_price=10)
+        
+        image = baker.make(ProductImage, product=product, image='store/media/photo.png')
+        
+        assert [entry['id'] for entry in ProductSummary.objects.get(pk=product.id).images] == [image.id]
+        
+        image.delete()
+        
+        assert ProductSummary.objects.get(pk=product.id).images == []
@@ -0,0 +1,131 @@
+import os
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from .models import ProductImage
+from .validator import MAX_IMAGE_SIZE
+
+# leading bytes of the formats FileExtensionValidator lets through on ProductImage.image
+IMAGE_SIGNATURES = [
+    b'\xff\xd8\xff',  # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+]
+SIGNATURE_LENGTH = max(len(signature) for signature in IMAGE_SIGNATURES)
+NOT_AN_IMAGE = 'Upload a valid image. The file you uploaded was either not an image or a corrupted image.'
+TOO_LARGE = f'Your file size is greater than {MAX_IMAGE_SIZE // 1024}KB!'
+
+
+class StoredUploadedFile(UploadedFile):
+    """An upload already written to its final storage name, saved by assigning that name."""
+    def __init__(self, storage, storage_name, path, size, content_type, charset, content_type_extra):
+        super().__init__(open(path, 'rb'), storage_name, content_type, size, charset, content_type_extra)
+        self.storage = storage
+        self.storage_name = storage_name
+        self.path = path
+
+    def temporary_file_path(self):
+        # lets the image validation open the file by path instead of reading it into memory
+        return self.path
+
+    def discard(self):
+        self.close()
+        self.storage.delete(self.storage_name)
+
+
+class ProductImageUploadHandler(FileUploadHandler):
+    """
+    Checks a product image while it streams in: uploads announcing more than
+    MAX_IMAGE_SIZE are refused before a byte is written, and each chunk must
+    keep the running size under it and, for the first bytes, match an image
+    signature. Accepted chunks go straight to the file's final place in the
+    ProductImage storage instead of memory or a temporary file. A refused
+    upload stops the parse without reading the rest of the body, and its
+    reason is left in `error`.
+    """
+    def __init__(self, request = None):
+        super().__init__(request)
+        self.field = ProductImage._meta.get_field('image')
+        self.storage = self.field.storage
+        self.error = None
+        # no `file` until one is opened, the parser closes `file` on any handler that has one
+        self.uploaded = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding = None):
+        # the multipart body also holds the boundaries and headers, allow a chunk of slack for them
+        if content_length and content_length > MAX_IMAGE_SIZE + self.chunk_size:
+            self.error = TOO_LARGE
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.error:
+            # handle_raw_input runs outside the parser's StopUpload handling, so the upload stops here
+            raise StopUpload(connection_reset = True)
+        self.head = b''
+        self.size = 0
+        name = self.field.generate_filename(None, self.file_name)
+        while True:
+            name = self.storage.get_available_name(name, max_length = self.field.max_length)
+            self.path = self.storage.path(name)
+            os.makedirs(os.path.dirname(self.path), exist_ok = True)
+            try:
+                # exclusive create, a concurrent upload may have taken the same name meanwhile
+                self.file = open(self.path, 'xb')
+                break
+            except FileExistsError:
+                continue
+        self.name = name
+
+    def discard_file(self, error):
+        self.error = error
+        self.file.close()
+        self.storage.delete(self.name)
+
+    def reject(self, error):
+        self.discard_file(error)
+        # the rest of the body is left unread, the server drops the connection after the 400
+        raise StopUpload(connection_reset = True)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > MAX_IMAGE_SIZE:
+            self.reject(TOO_LARGE)
+        if len(self.head) < SIGNATURE_LENGTH:
+            self.head += raw_data[:SIGNATURE_LENGTH]
+            if not self.has_image_signature():
+                self.reject(NOT_AN_IMAGE)
+        self.file.write(raw_data)
+        # the file is fully handled here, no other handler gets the chunk
+        return None
+
+    def has_image_signature(self):
+        for signature in IMAGE_SIGNATURES:
+            known = min(len(self.head), len(signature))
+            if self.head[:known] == signature[:known]:
+                return True
+        return False
+
+    def file_complete(self, file_size):
+        if not any(self.head.startswith(signature) for signature in IMAGE_SIGNATURES):
+            # too short to tell, StopUpload isn't handled this late so the file is just left out
+            self.discard_file(NOT_AN_IMAGE)
+            return None
+        self.file.close()
+        if self.storage.file_permissions_mode is not None:
+            os.chmod(self.path, self.storage.file_permissions_mode)
+        self.uploaded = StoredUploadedFile(self.storage, self.name, self.path, file_size,
+                                           self.content_type, self.charset, self.content_type_extra)
+        return self.uploaded
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file') and not self.file.closed:
+            self.file.close()
+            self.storage.delete(self.name)
+
+    def discard(self):
+        # the upload was stored but the request failed validation later on
+        if self.uploaded is not None:
+            self.uploaded.discard()
+
+    def close(self):
+        # the image validation still reads the open file, so it is closed once the view is done with it
+        if self.uploaded is not None:
+            self.uploaded.close()
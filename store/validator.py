@@ -1,8 +1,8 @@
 from django.core.exceptions import ValidationError
 
+MAX_IMAGE_SIZE = 6000 * 1024 #byte
+
 def validate_image_size(file):
-    max_file_size = 6000
-    
-    if file.size > max_file_size * 1024:
-        raise ValidationError(f'Your file size is greater than {max_file_size}KB!')
+    if file.size > MAX_IMAGE_SIZE:
+        raise ValidationError(f'Your file size is greater than {MAX_IMAGE_SIZE // 1024}KB!')
 
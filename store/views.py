@@ -1,55 +1,102 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
-from django.db.models import Count
+from django.http import Http404
+from django.db.models import Prefetch, ProtectedError
+from django.core.cache import cache
 from rest_framework.mixins import CreateModelMixin, ListModelMixin, RetrieveModelMixin, DestroyModelMixin, UpdateModelMixin
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
 from .serializers import ProductSerializers, CollectionSerializers, ReviewsSerilizer,\
                          CartSerializers, CartItemSerializers, AddCartItemSerializers,\
                          UpdateCartItemSerializers, CustomerSerializers, OrderSerializers,\
-                         CreateOrderSerializers, UpdateOrderSerializers, ProductImageSerializers
-from .models import Product, Collection, OrderItem, ProductImage, Reviews, Cart, CartItem, Customer, Order
-from .pagination import DefaultPagination
-from .filters import ProductFilter
+                         CreateOrderSerializers, UpdateOrderSerializers, ProductImageSerializers,\
+                         ProductSummarySerializers, BatchCartItemSerializers
+from .models import Product, Collection, OrderItem, ProductImage, Reviews, Cart, CartItem, Customer, Order, ProductSummary
+from .pagination import DefaultPagination, OrderPagination
+from .filters import ProductFilter, ProductSummaryFilter
+from .search import ProductSearchFilter
 from .permissions import IsAdminOrReadOnly, CustomeDjangoModelPermissions, ViewCustomerHistoryPermission
+from .cache import PRODUCT_CACHE_TIMEOUT, product_list_key, product_detail_key
+from .carts import get_cart_store
+from .customers import get_customer
+from .uploadhandlers import ProductImageUploadHandler
+from core.metrics import record_cache_lookup
 
 
 class ProductViewSets(ModelViewSet):
     queryset = Product.objects.prefetch_related('image').all()
-    serializer_class = ProductSerializers
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_class = ProductFilter
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
     pagination_class = DefaultPagination
     permission_classes = [IsAdminOrReadOnly]
     search_fields = ['title', 'description']
     ordering_fields = ['unit_price', 'last_update']
+    # reads are served from the denormalized ProductSummary table
+    read_actions = ['list', 'retrieve']
+    
+    @property
+    def filterset_class(self):
+        if self.action in self.read_actions:
+            return ProductSummaryFilter
+        return ProductFilter
+    
+    def get_queryset(self):
+        if self.action in self.read_actions:
+            return ProductSummary.objects.all()
+        return super().get_queryset()
+    
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return ProductSummarySerializers
+        return ProductSerializers
     
     def get_serializer_context(self):
         return {'request': self.request}
     
+    def list(self, request, *args, **kwargs):
+        key = product_list_key(request)
+        data = cache.get(key)
+        record_cache_lookup('product_list', data is not None)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, PRODUCT_CACHE_TIMEOUT)
+        return Response(data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        key = product_detail_key(request, kwargs['pk'])
+        data = cache.get(key)
+        record_cache_lookup('product_detail', data is not None)
+        if data is None:
+            data = super().retrieve(request, *args, **kwargs).data
+            cache.set(key, data, PRODUCT_CACHE_TIMEOUT)
+        return Response(data)
+    
     def destroy(self, request, *args, **kwargs):
         if OrderItem.objects.filter(product_id= kwargs['pk']).count() > 0:
             return Response({'error': 'product cannot be deleted bcause it include one or more ordered item.'})
         return super().destroy(request, *args, **kwargs)
 
 class CollectionViewSets(ModelViewSet):
-    queryset = Collection.objects.annotate(
-        products_count= Count('products')).all() 
+    queryset = Collection.objects.all()
     serializer_class = CollectionSerializers
     permission_classes = [IsAdminOrReadOnly]
     
     def get_serializer_context(self):
         return {'request': self.request}
     
-    def delete(self, request, pk):
-        collection = get_object_or_404(Collection, pk)
-        if collection.products.count() > 0 :
-            return Response({'error': 'collection cannot be deleted bcause it include one or more product.'}, status= status.HTTP_400_BAD_REQUEST)
-        collection.delete()
+    def destroy(self, request, *args, **kwargs):
+        collection = self.get_object()
+        error = {'error': 'collection cannot be deleted bcause it include one or more product.'}
+        if collection.products_count > 0 :
+            return Response(error, status= status.HTTP_400_BAD_REQUEST)
+        try:
+            collection.delete()
+        except ProtectedError:
+            # the counter drifted, products still point at the collection
+            return Response(error, status= status.HTTP_400_BAD_REQUEST)
         return Response(status= status.HTTP_204_NO_CONTENT)
     
 class ReviewsViewSets(ModelViewSet):
@@ -59,7 +106,7 @@ class ReviewsViewSets(ModelViewSet):
         return Reviews.objects.filter(product_id = self.kwargs['products_pk'])
     
     def get_serializer_context(self):
-        return {'product_id': self.kwargs['products_pk']}
+        return {'product_id': self.kwargs['products_pk'], 'request': self.request}
     
 class CartViewSets(CreateModelMixin, 
                   RetrieveModelMixin, 
@@ -67,6 +114,22 @@ class CartViewSets(CreateModelMixin,
                   GenericViewSet):
     queryset = Cart.objects.prefetch_related('items__product').all()
     serializer_class = CartSerializers
+    
+    # carts live in the configured cart store (STORE_CART_ENGINE), not necessarily in the database
+    def create(self, request, *args, **kwargs):
+        cart = get_cart_store().create()
+        return Response(CartSerializers(cart).data, status= status.HTTP_201_CREATED)
+    
+    def get_object(self):
+        cart = get_cart_store().get(self.kwargs['pk'])
+        if cart is None:
+            raise Http404('No cart with given id was found')
+        return cart
+    
+    def destroy(self, request, *args, **kwargs):
+        if not get_cart_store().delete(kwargs['pk']):
+            raise Http404('No cart with given id was found')
+        return Response(status= status.HTTP_204_NO_CONTENT)
 
 class CartItemViewSets(ModelViewSet): 
     http_method_names = ['get', 'post', 'patch', 'delete']
@@ -75,6 +138,8 @@ class CartItemViewSets(ModelViewSet):
         return {'cart_id': self.kwargs['carts_pk']}
     
     def get_serializer_class(self):
+        if self.action == 'batch':
+            return BatchCartItemSerializers
         if self.request.method == 'POST':
             return AddCartItemSerializers
         if self.request.method == 'PATCH':
@@ -85,6 +150,28 @@ class CartItemViewSets(ModelViewSet):
         return CartItem.objects.\
             filter(cart_id = self.kwargs['carts_pk'])\
             .select_related('product')
+    
+    def list(self, request, *args, **kwargs):
+        items = get_cart_store().get_items(self.kwargs['carts_pk'])
+        return Response(CartItemSerializers(items, many= True).data)
+    
+    def get_object(self):
+        item = get_cart_store().get_item(self.kwargs['carts_pk'], self.kwargs['pk'])
+        if item is None:
+            raise Http404('No cart item with given id was found')
+        return item
+    
+    def perform_destroy(self, instance):
+        get_cart_store().remove_item(instance)
+    
+    @action(detail= False, methods= ['POST'])
+    def batch(self, request, carts_pk):
+        if not get_cart_store().exists(carts_pk):
+            raise Http404('No cart with given id was found')
+        serializer = BatchCartItemSerializers(data= request.data, context= self.get_serializer_context())
+        serializer.is_valid(raise_exception= True)
+        items = serializer.save()
+        return Response(CartItemSerializers(items, many= True).data)
             
 
 class CustomerViewSets(ModelViewSet):
@@ -102,7 +189,7 @@ class CustomerViewSets(ModelViewSet):
         if not request.user.is_authenticated:
             return Response("User not authenticated", status=status.HTTP_401_UNAUTHORIZED) 
                
-        customer= Customer.objects.get(user_id = request.user.id)
+        customer= get_object_or_404(Customer, pk = get_customer(request, create = True).id)
         if request.method == 'GET':
             serialier = CustomerSerializers(customer)
             return Response(serialier.data)
@@ -114,6 +201,7 @@ class CustomerViewSets(ModelViewSet):
         
 class OrderViewSets(ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete', 'options', 'head']
+    pagination_class = OrderPagination
     
     def get_permissions(self):
         if self.request.method in ['PATCH', 'DELETE']:
@@ -123,7 +211,8 @@ class OrderViewSets(ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializers(
             data= request.data,
-            context = {'user_id': self.request.user.id})
+            context = {'user_id': self.request.user.id,
+                       'customer_id': get_customer(self.request, create = True).id})
         serializer.is_valid(raise_exception= True)
         order = serializer.save()
         serializer = OrderSerializers(order)
@@ -138,17 +227,51 @@ class OrderViewSets(ModelViewSet):
         
     
     def get_queryset(self):
+        # one query for the items and their products whatever the page size,
+        # loading only the columns OrderItemSerializers and SimpleProduct render
+        items = OrderItem.objects\
+            .select_related('product')\
+            .only('order', 'quantity', 'unit_price', 'product__title', 'product__description', 'product__unit_price')
+        queryset = Order.objects.prefetch_related(Prefetch('items', queryset = items))
         user = self.request.user
         if user.is_staff:
-            return Order.objects.all()
-        customer_id = Customer.objects.only('id').get(user_id= user.id)
-        return Order.objects.filter(customer_id = customer_id)
+            return queryset
+        customer = get_customer(self.request)
+        if customer is None:
+            return queryset.none()
+        return queryset.filter(customer_id = customer.id)
 
 class ProductImageViewSets(ModelViewSet):
     serializer_class = ProductImageSerializers
     
+    def initialize_request(self, request, *args, **kwargs):
+        # must be in place before anything reads the body
+        self.upload_handler = ProductImageUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+    
+    def handle_upload(self, handler, request, *args, **kwargs):
+        # parsing the body is what runs the upload handler
+        request.data
+        if self.upload_handler.error:
+            return Response({'image': [self.upload_handler.error]}, status= status.HTTP_400_BAD_REQUEST)
+        try:
+            return handler(request, *args, **kwargs)
+        except Exception:
+            # the file was written to its final place while it streamed in
+            self.upload_handler.discard()
+            raise
+        finally:
+            self.upload_handler.close()
+    
+    def create(self, request, *args, **kwargs):
+        return self.handle_upload(super().create, request, *args, **kwargs)
+    
+    def update(self, request, *args, **kwargs):
+        return self.handle_upload(super().update, request, *args, **kwargs)
+    
     def get_queryset(self):
         return ProductImage.objects.filter(product_id= self.kwargs['products_pk'])
 
     def get_serializer_context(self):
-        return {'product_id': self.kwargs['products_pk']}    
\ No newline at end of file
+        return {'product_id': self.kwargs['products_pk'], 'request': self.request}    
\ No newline at end of file
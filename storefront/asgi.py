@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings.dev')
+# sync views run on a fresh thread per request here, a persistent connection
+# would be left open on every one of them. Use DB_POOL_SIZE to reuse connections
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
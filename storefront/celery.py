@@ -1,9 +1,26 @@
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_shutdown
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings.dev')
 
 celery = Celery('storefront')
 celery.config_from_object('django.conf:settings', namespace= 'CELERY')
 celery.autodiscover_tasks()
-celery.conf.broker_connection_retry_on_startup = True
\ No newline at end of file
+celery.conf.broker_connection_retry_on_startup = True
+
+
+# tasks run in the pool's child processes, each writes its values to
+# PROMETHEUS_MULTIPROC_DIR and the main worker process serves them added up
+@worker_init.connect
+def serve_metrics(**kwargs):
+    port = os.environ.get('CELERY_METRICS_PORT')
+    if port:
+        from core.metrics import serve
+        serve(int(port))
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid, **kwargs):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,82 @@
+"""
+Gunicorn configuration for serving storefront in production.
+
+    gunicorn -c python:storefront.serving
+
+STOREFRONT_WORKER_CLASS picks the worker model:
+
+    gthread  threaded WSGI workers running storefront.wsgi (default)
+    uvicorn  event loop ASGI workers running storefront.asgi
+
+Worker and thread counts are sized from the CPU count and can be
+overridden with GUNICORN_WORKERS and GUNICORN_THREADS.
+"""
+
+import os
+import shutil
+
+WORKER_MODELS = {
+    'gthread': {
+        'worker_class': 'gthread',
+        'wsgi_app': 'storefront.wsgi:application',
+    },
+    'uvicorn': {
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'wsgi_app': 'storefront.asgi:application',
+    },
+}
+
+worker_model = os.environ.get('STOREFRONT_WORKER_CLASS', 'gthread')
+if worker_model not in WORKER_MODELS:
+    raise RuntimeError(f'STOREFRONT_WORKER_CLASS must be one of {", ".join(WORKER_MODELS)}, not {worker_model!r}')
+
+worker_class = WORKER_MODELS[worker_model]['worker_class']
+wsgi_app = WORKER_MODELS[worker_model]['wsgi_app']
+
+bind = os.environ.get('GUNICORN_BIND', f'0.0.0.0:{os.environ.get("PORT", "8000")}')
+
+cpus = os.cpu_count() or 1
+# threads wait on MySQL and Redis, a few per core keep it busy. An event loop
+# worker already overlaps its waits, one per core plus one is enough
+workers = int(os.environ.get('GUNICORN_WORKERS', cpus + 1 if worker_model == 'uvicorn' else cpus * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# workers are forked from an already loaded app and share its memory copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# recycle workers to cap slow leaks, jittered so they don't all restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# longer than the load balancer's idle timeout, so it closes idle connections first
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+accesslog = '-'
+# RotatingFileHandler isn't safe across processes, the workers would rotate
+# general.log under each other. They log to stdout and the host collects it
+os.environ.setdefault('CORE_LOG_FILE', '')
+
+# every worker writes its metrics here and /metrics adds them up, see core.metrics.
+# It has to be set before the app, and so prometheus_client, is imported
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/storefront-metrics')
+
+
+def on_starting(server):
+    # values left by the workers of an earlier run would be counted again
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors = True)
+    os.makedirs(directory)
+
+
+def pre_fork(server, worker):
+    # runs in the master, the preloaded app's connections must not be shared by the workers
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -35,9 +35,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework',
     'djoser',
-    'silk',
     'playground',
-    'debug_toolbar',
     'store',
     'tags',
     'likes',
@@ -46,7 +44,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.RequestIdMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,16 +57,30 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-# if DEBUG:
-#     MIDDLEWARE += ['silk.middleware.SilkyMiddleware']
+# fraction of requests core.middleware.SamplingProfilerMiddleware profiles, the
+# last CORE_PROFILER_BUFFER_SIZE samples of each process are served at /profiler/
+CORE_PROFILER_SAMPLE_RATE = float(os.environ.get('CORE_PROFILER_SAMPLE_RATE', '0.01'))
+CORE_PROFILER_BUFFER_SIZE = 1000
+
+# /metrics is served to staff and to scrapers sending this as a Bearer token
+CORE_METRICS_TOKEN = os.environ.get('CORE_METRICS_TOKEN', '')
+
+# DB_POOL_SIZE > 0 shares up to that many connections between the threads of
+# a process, in place of holding one persistent connection per thread. A
+# request waits up to DB_POOL_TIMEOUT seconds for one when all are in use
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'core.db.mysql',
         'NAME': 'storefront',
         'HOST': 'localhost',
         'USER': 'root',
-        'PASSWORD': 'Tehran_City1'
+        'PASSWORD': 'Tehran_City1',
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', 60)), #second
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'OPTIONS': {'pool': {'max_size': DB_POOL_SIZE, 'timeout': DB_POOL_TIMEOUT}} if DB_POOL_SIZE else {}
     }
 }
 
@@ -152,7 +166,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
 }
 
@@ -167,46 +181,123 @@ DJOSER = {
 
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1)
+    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.serializers.TokenRefreshSerializer',
 }
 
+# access tokens carry is_staff, the customer id and the permissions, requests
+# trust them instead of loading the user for this long after they were issued,
+# or until a change to the user revokes them, see core.authentication
+CORE_TOKEN_CLAIMS_MAX_AGE = 15 * 60 #second
+
 DEFAULT_FROM_EMAIL = 'from@moshbuy.com'
 
 ADMINS = [
     ('Mosh', 'admin@moshbuy.com')
 ]
 
+# where anonymous carts are kept, 'store.carts.RedisCartStore' holds them in the
+# default cache's Redis until checkout instead of writing Cart/CartItem rows
+STORE_CART_ENGINE = os.environ.get('STORE_CART_ENGINE', 'store.carts.DatabaseCartStore')
+STORE_CART_TTL = 7 * 24 * 60 * 60 #second
+
+# carts older than this are deleted by store.tasks.purge_abandoned_carts
+STORE_CART_MAX_AGE = 30 * 24 * 60 * 60 #second
+STORE_CART_PURGE_BATCH_SIZE = 1000
+
+# per process cache of user id -> customer id and membership, see store.customers
+STORE_CUSTOMER_CACHE_SIZE = 10000
+STORE_CUSTOMER_CACHE_TTL = 60 #second
+
+# playground.tasks.notify_customers sends chunks of this many emails over one SMTP
+# connection, each worker sends at most NOTIFY_CUSTOMERS_RATE_LIMIT chunks
+NOTIFY_CUSTOMERS_CHUNK_SIZE = 100
+NOTIFY_CUSTOMERS_RATE_LIMIT = os.environ.get('NOTIFY_CUSTOMERS_RATE_LIMIT', '30/m')
+NOTIFY_CUSTOMERS_CAMPAIGN_TTL = 7 * 24 * 60 * 60 #second
+# longest a fan-out may hold its campaign before another run can take it over
+NOTIFY_CUSTOMERS_FANOUT_TIMEOUT = 10 * 60 #second
+
+# upstream of playground's hello endpoints, point it at a local stub in tests
+HELLO_UPSTREAM_URL = os.environ.get('HELLO_UPSTREAM_URL', 'https://httpbin.org/delay/2')
+HELLO_UPSTREAM_TIMEOUT = 5 #second
+HELLO_UPSTREAM_CONNECT_TIMEOUT = 2 #second
+HELLO_UPSTREAM_MAX_CONNECTIONS = 20
+
+# events per claim in store.tasks.relay_outbox
+STORE_OUTBOX_BATCH_SIZE = 100
+# a claimed event is offered again when its relay didn't finish within the lease
+STORE_OUTBOX_LEASE = 5 * 60 #second
+# failed deliveries before an event is set aside as dead
+STORE_OUTBOX_MAX_ATTEMPTS = 10
+
 CELERY_BEAT_SCHEDULE = {
     'notify_customers': {
         'task': 'playground.tasks.notify_customers',
-        'schedule': 5,
+        'schedule': crontab(hour=9, minute=0),
         'args': ['Hello World'],
+    },
+    'purge_abandoned_carts': {
+        'task': 'store.tasks.purge_abandoned_carts',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    # checkout queues a relay on commit, this picks up what a lost queue message left behind
+    'relay_outbox': {
+        'task': 'store.tasks.relay_outbox',
+        'schedule': 30,
     }
 }
 
+# root only queues records, core.logs' listener thread writes them through the sink handlers
+CORE_LOG_BATCH_SIZE = 100
+CORE_LOG_FORMATTER = os.environ.get('CORE_LOG_FORMATTER', 'verbose')
+# empty leaves the console as the only sink, e.g. under gunicorn where every
+# worker process would otherwise rotate the same file, see storefront.serving
+CORE_LOG_FILE = os.environ.get('CORE_LOG_FILE', 'general.log')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'core.logs.RequestIdFilter'
+        }
+    },
     'handlers': {
+        'queue': {
+            'class': 'core.logs.QueuedHandler',
+            'filters': ['request_id']
+        },
         'console': {
-            'class': 'logging.StreamHandler'
+            'class': 'logging.StreamHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': CORE_LOG_FORMATTER
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': 'general.log',
-            'formatter': 'verbose'
+            'class': 'core.logs.BatchedRotatingFileHandler',
+            'filename': CORE_LOG_FILE or 'general.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'formatter': CORE_LOG_FORMATTER
         }
     },
     'loggers': {
         '': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': os.environ.get('DJANGO_LOG_LEVEL', 'INFO')
+        },
+        'core.logs.sink': {
+            'handlers': ['console', 'file'] if CORE_LOG_FILE else ['console'],
+            'propagate': False
         }
     },
     'formatters': {
         'verbose': {
-            'format': '{asctime} ({levelname}) - {name} - {message}',
+            'format': '{asctime} ({levelname}) [{request_id}] - {name} - {message}',
             'style': '{'
+        },
+        'json': {
+            '()': 'core.logs.JsonFormatter'
         }
     }
 }
@@ -22,6 +22,10 @@ EMAIL_HOST_USER = ''
 EMAIL_HOST_PASSWORD = ''
 EMAIL_PORT = 2525
 
+INSTALLED_APPS += ['debug_toolbar']
+MIDDLEWARE.insert(MIDDLEWARE.index('corsheaders.middleware.CorsMiddleware') + 1,
+                  'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 DEBUG_TOOLBAR_CONFIG = {
     'SHOW_TOOBAR_CALLBACK': lambda request: True
 }
\ No newline at end of file
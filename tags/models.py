@@ -1,3 +1,4 @@
+from collections import defaultdict
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -19,10 +20,23 @@ class TaggedItemManager(models.Manager):
                     content_type = content_type,
                     object_id = obj_id
                     )
+    
+    def get_tags_for_many(self, obj_type, obj_ids):
+        # get_for_model is served from ContentTypeManager's per process cache after the first call
+        content_type = ContentType.objects.get_for_model(obj_type)
+        tags = defaultdict(list)
+        for item in TaggedItem.objects.select_related('tag')\
+                .filter(content_type = content_type, object_id__in = list(obj_ids))\
+                .order_by('tag__label'):
+            tags[item.object_id].append(item.tag)
+        return dict(tags)
                 
 class TaggedItem(models.Model):
     objects = TaggedItemManager()
     tag = models.ForeignKey(Tag, on_delete = models.PROTECT)
     content_type = models.ForeignKey(ContentType, on_delete = models.CASCADE)
     object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey()
\ No newline at end of file
+    content_object = GenericForeignKey()
+    
+    class Meta:
+        indexes = [models.Index(fields = ['content_type', 'object_id'])]